@@ -11,6 +11,7 @@ import {
   type RoundScoreResult,
 } from "../../../services/multiplayerScoring";
 import { qcmCache } from "../../../services/qcmOptionsCache";
+import { metadataExtractor } from "../services/metadata-extractor";
 import type { MotoAnswer } from "../../../services/scoring";
 
 const router = Router();
@@ -558,6 +559,18 @@ router.get("/:sessionId/coherent-options", async (req, res) => {
       });
     }
 
+    // Motos confondables avec le titre de la vidéo : meilleurs leurres
+    let lookalikes: { manufacturer: string; model: string }[] = [];
+    if (source.title) {
+      try {
+        const candidates = await metadataExtractor.extractCandidates(source.title, optionCount);
+        lookalikes = candidates.map((candidate) => candidate.metadata);
+      } catch (extractError) {
+        // Démon lent (délai dépassé) ou indisponible : générateur d'options seul
+        console.warn("[GET /coherent-options] Candidats indisponibles:", extractError);
+      }
+    }
+
     // Générer les options cohérentes
     try {
       const coherentMotos = qcmCache.generateCoherentOptions(
@@ -565,7 +578,8 @@ router.get("/:sessionId/coherent-options", async (req, res) => {
           manufacturer: source.moto.manufacturer,
           model: source.moto.name,
         },
-        optionCount
+        optionCount,
+        lookalikes
       );
 
       // Retourner les options avec manufacturer et model séparés
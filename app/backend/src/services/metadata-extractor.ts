@@ -1,9 +1,10 @@
 /**
  * Service d'extraction de métadonnées de motos
- * Utilise l'extracteur hybride Python (DB + IA)
+ * Utilise l'extracteur hybride Python (DB + IA), via un démon résident
  */
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import path from 'path';
+import { createInterface } from 'readline';
 
 export interface MotorcycleMetadata {
   manufacturer: string;
@@ -13,16 +14,43 @@ export interface MotorcycleMetadata {
   year: string;
 }
 
+export interface ExtractionCandidate {
+  metadata: MotorcycleMetadata;
+  // Confiance calibrée entre candidats (deux modèles cités se la partagent)
+  confidence: number;
+  // Confiance brute du candidat
+  score: number;
+}
+
 export interface ExtractionResult {
   metadata: MotorcycleMetadata | null;
   confidence: number;
   shouldSkip: boolean;
+  candidates?: ExtractionCandidate[];
 }
 
+interface PendingRequest {
+  resolve: (result: ExtractionResult) => void;
+  reject: (err: Error) => void;
+}
+
+// Délai maximal d'une extraction (le fallback IA peut être lent sur CPU)
+const EXTRACT_TIMEOUT_MS = 30000;
+// Candidats top-k : base seule, une réponse rapide ou rien
+const CANDIDATES_TIMEOUT_MS = 2000;
+// Après un échec du démon, pas de relance avant ce délai
+const RESPAWN_BACKOFF_MS = 30000;
+
 export class MetadataExtractorService {
   private pythonPath: string;
   private scriptPath: string;
   private minConfidence: number;
+  // Démon Python résident : base, index et modèle chargés une seule fois
+  private daemon: ChildProcessWithoutNullStreams | null = null;
+  private nextRequestId = 1;
+  private pending = new Map<number, PendingRequest>();
+  // Date avant laquelle le démon n'est pas relancé (échec récent)
+  private respawnAfter = 0;
 
   constructor(minConfidence: number = 0.90) {
     this.minConfidence = minConfidence;
@@ -32,58 +60,148 @@ export class MetadataExtractorService {
   }
 
   /**
-   * Extrait les métadonnées d'un titre YouTube
+   * Démarre le démon d'extraction si nécessaire
    */
-  async extract(title: string, useAiFallback: boolean = true): Promise<ExtractionResult> {
-    return new Promise((resolve, reject) => {
-      const args = [
-        this.scriptPath,
-        '--title', title,
-        '--min-confidence', this.minConfidence.toString(),
-        '--quiet',  // Mode silencieux pour sortie JSON propre
-      ];
-
-      if (!useAiFallback) {
-        args.push('--no-ai-fallback');
-      }
+  private ensureDaemon(): ChildProcessWithoutNullStreams {
+    if (this.daemon) {
+      return this.daemon;
+    }
+    if (Date.now() < this.respawnAfter) {
+      const seconds = Math.ceil((this.respawnAfter - Date.now()) / 1000);
+      throw new Error(`Extraction daemon unavailable (retry in ${seconds}s)`);
+    }
 
-      const process = spawn(this.pythonPath, args);
+    const daemon = spawn(this.pythonPath, [
+      this.scriptPath,
+      '--daemon',
+      '--min-confidence', this.minConfidence.toString(),
+    ]);
+
+    let stderr = '';
+
+    // Une réponse JSON par ligne, associée à sa requête par son id
+    createInterface({ input: daemon.stdout }).on('line', (line) => {
+      let response: any;
+      try {
+        response = JSON.parse(line);
+      } catch (err) {
+        return;
+      }
 
-      let stdout = '';
-      let stderr = '';
+      const request = this.pending.get(response.id);
+      if (!request) {
+        return;
+      }
+      this.pending.delete(response.id);
 
-      process.stdout.on('data', (data) => {
-        stdout += data.toString();
+      if (response.error) {
+        request.reject(new Error(`Extraction failed: ${response.error}`));
+        return;
+      }
+      request.resolve({
+        metadata: response.metadata,
+        confidence: response.confidence,
+        shouldSkip: response.should_skip,
+        candidates: response.candidates,
       });
+    });
 
-      process.stderr.on('data', (data) => {
-        stderr += data.toString();
-      });
+    daemon.stderr.on('data', (data) => {
+      // Garder seulement la fin des logs pour les messages d'erreur
+      stderr = (stderr + data.toString()).slice(-2000);
+    });
 
-      process.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Extraction failed: ${stderr}`));
-          return;
-        }
-
-        try {
-          const result = JSON.parse(stdout);
-          resolve({
-            metadata: result.metadata,
-            confidence: result.confidence,
-            shouldSkip: result.should_skip,
-          });
-        } catch (err) {
-          reject(new Error(`Failed to parse extraction result: ${err}`));
-        }
-      });
+    const failAll = (err: Error) => {
+      if (this.daemon === daemon) {
+        // Arrêt inattendu (script absent, crash au démarrage...) : pas de relance immédiate
+        this.daemon = null;
+        this.respawnAfter = Date.now() + RESPAWN_BACKOFF_MS;
+      }
+      for (const request of this.pending.values()) {
+        request.reject(err);
+      }
+      this.pending.clear();
+    };
 
-      process.on('error', (err) => {
-        reject(new Error(`Failed to spawn Python process: ${err.message}`));
+    daemon.on('close', (code) => {
+      failAll(new Error(`Extraction daemon exited (code ${code}): ${stderr}`));
+    });
+
+    daemon.on('error', (err) => {
+      failAll(new Error(`Failed to spawn Python process: ${err.message}`));
+    });
+
+    daemon.stdin.on('error', (err) => {
+      failAll(new Error(`Extraction daemon unreachable: ${err.message}`));
+    });
+
+    this.daemon = daemon;
+    return daemon;
+  }
+
+  /**
+   * Extrait les métadonnées d'un titre YouTube
+   */
+  async extract(title: string, useAiFallback: boolean = true): Promise<ExtractionResult> {
+    return this.send({ title, use_ai_fallback: useAiFallback }, EXTRACT_TIMEOUT_MS);
+  }
+
+  /**
+   * Les k motos les plus probables pour un titre (base seule, sans IA),
+   * en une seule extraction : désambiguïsation et leurres de QCM
+   */
+  async extractCandidates(
+    title: string,
+    k: number = 4,
+    timeoutMs: number = CANDIDATES_TIMEOUT_MS
+  ): Promise<ExtractionCandidate[]> {
+    const result = await this.send({ title, use_ai_fallback: false, top_k: k }, timeoutMs);
+    return result.candidates ?? [];
+  }
+
+  /**
+   * Envoie une requête au démon et attend la réponse portant le même id
+   * (rejetée au-delà de timeoutMs ; une réponse tardive est ignorée)
+   */
+  private send(request: Record<string, unknown>, timeoutMs: number): Promise<ExtractionResult> {
+    return new Promise((resolve, reject) => {
+      const daemon = this.ensureDaemon();
+      const id = this.nextRequestId++;
+
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Extraction timed out after ${timeoutMs} ms`));
+      }, timeoutMs);
+
+      // Les requêtes sont pipelinées : plusieurs peuvent être en vol en même temps
+      this.pending.set(id, {
+        resolve: (result) => {
+          clearTimeout(timer);
+          resolve(result);
+        },
+        reject: (err) => {
+          clearTimeout(timer);
+          reject(err);
+        },
       });
+      daemon.stdin.write(JSON.stringify({
+        id,
+        min_confidence: this.minConfidence,
+        ...request,
+      }) + '\n');
     });
   }
 
+  /**
+   * Arrête le démon d'extraction
+   */
+  close(): void {
+    if (this.daemon) {
+      this.daemon.stdin.end();
+      this.daemon = null;
+    }
+  }
+
   /**
    * Valide si une vidéo doit être acceptée ou rejetée
    */
@@ -168,11 +168,14 @@ class QCMOptionsCache {
    * Les options proposées seront des vraies combinaisons manufacturer/model qui existent
    * @param correctMoto La moto correcte avec tous ses champs
    * @param count Nombre d'options à générer
+   * @param lookalikes Motos proches (ex: candidats top-k de l'extracteur),
+   *   utilisées en priorité comme mauvaises réponses
    * @returns Tableau de motos alternatives + la bonne réponse, mélangé
    */
   generateCoherentOptions(
     correctMoto: { manufacturer: string; model: string },
-    count: number = 4
+    count: number = 4,
+    lookalikes: { manufacturer: string; model: string }[] = []
   ): MotoData[] {
     if (!this.initialized) {
       throw new Error(
@@ -209,11 +212,23 @@ class QCMOptionsCache {
       return [correctFullMoto];
     }
 
-    // Sélectionner aléatoirement (count - 1) autres motos
-    const selectedWrong = this.selectRandom(
-      otherMotos,
-      Math.min(count - 1, otherMotos.length)
-    );
+    // Leurres d'abord (dans leur ordre), puis complément aléatoire
+    const wantedCount = Math.min(count - 1, otherMotos.length);
+    const preferred = new Set<MotoData>();
+    for (const lookalike of lookalikes) {
+      const moto = otherMotos.find(
+        (m) => m.manufacturer === lookalike.manufacturer && m.model === lookalike.model
+      );
+      if (moto) preferred.add(moto);
+    }
+    const selectedPreferred = Array.from(preferred).slice(0, wantedCount);
+    const selectedWrong = [
+      ...selectedPreferred,
+      ...this.selectRandom(
+        otherMotos.filter((m) => !selectedPreferred.includes(m)),
+        wantedCount - selectedPreferred.length
+      ),
+    ];
 
     // Combiner avec la bonne moto
     const options = [...selectedWrong, correctFullMoto];
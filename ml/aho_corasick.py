@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Automate d'Aho–Corasick pour la recherche multi-motifs
+Trouve en une seule passe linéaire toutes les occurrences exactes
+des noms de la base (fabricants, modèles, variantes) dans un titre
+"""
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+
+class AhoCorasick:
+    def __init__(self):
+        # Trie : transitions, lien d'échec et valeurs terminales par nœud
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: Any):
+        """Ajoute un motif associé à une valeur (plusieurs valeurs possibles par motif)"""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """Calcule les liens d'échec (parcours en largeur du trie)"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Hériter des motifs qui se terminent au même endroit (suffixes)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+        self._built = True
+
+    def find_all(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        Retourne toutes les occurrences exactes dans le texte
+
+        Returns:
+            Liste de (début, fin, valeur), triée par position de fin
+        """
+        if not self._built:
+            self.build()
+
+        hits = []
+        node = 0
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in outputs[node]:
+                hits.append((end - length, end, value))
+        return hits
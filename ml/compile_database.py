@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Compile motorcycle_database.json (formes normalisées + index de matching)
+en un artefact binaire chargé directement par HybridMotorcycleExtractor
+
+Étape de build optionnelle : l'extracteur recompile de lui-même quand
+le hash du JSON change, ce script permet de le faire à l'avance (image Docker, CI)
+"""
+import pickle
+import time
+
+from hybrid_extractor import COMPILED_DB_FORMAT, COMPILED_DB_PATH, HybridMotorcycleExtractor
+
+
+def main():
+    # Forcer la reconstruction
+    if COMPILED_DB_PATH.exists():
+        COMPILED_DB_PATH.unlink()
+
+    start = time.perf_counter()
+    extractor = HybridMotorcycleExtractor(verbose=False, cache_size=0)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    HybridMotorcycleExtractor(verbose=False, cache_size=0)
+    load_time = time.perf_counter() - start
+
+    print(f"✅ Base compilée: {COMPILED_DB_PATH}")
+    print(f"   Version:         {extractor.db_version}")
+    print(f"   Entrées:         {len(extractor.database)}")
+    print(f"   Taille:          {COMPILED_DB_PATH.stat().st_size / 1024:.1f} KB")
+    print(f"   Construction:    {build_time * 1000:.1f} ms")
+    print(f"   Chargement:      {load_time * 1000:.1f} ms")
+
+    check_corrupt_artifacts(extractor)
+
+
+def check_corrupt_artifacts(extractor: HybridMotorcycleExtractor):
+    """
+    Un artefact tronqué ou corrompu ne doit pas faire échouer l'extracteur :
+    il est reconstruit depuis le JSON (et réécrit)
+    """
+    valid = COMPILED_DB_PATH.read_bytes()
+    header = {
+        "format": COMPILED_DB_FORMAT,
+        "version": extractor.db_version,
+        "index_version": extractor._index_version,
+        "vector_min_entries": extractor.vector_min_entries,
+    }
+    artifacts = {
+        "tronqué": valid[:len(valid) // 2],
+        "octets aléatoires": b"\x80\x05garbage" * 64,
+        "index incomplet": pickle.dumps({**header, "index": {}}),
+        "index d'un autre type": pickle.dumps({**header, "index": [1, 2, 3]}),
+    }
+    expected = extractor.extract("Ducati Panigale V4S 2023", use_ai_fallback=False)
+
+    failures = 0
+    for name, content in artifacts.items():
+        COMPILED_DB_PATH.write_bytes(content)
+        try:
+            rebuilt = HybridMotorcycleExtractor(verbose=False, cache_size=0)
+            ok = (rebuilt.extract("Ducati Panigale V4S 2023", use_ai_fallback=False) == expected
+                  and COMPILED_DB_PATH.read_bytes() != content)
+        except Exception as e:
+            print(f"   ❌ Artefact {name}: {type(e).__name__}: {e}")
+            ok = False
+        failures += not ok
+        if ok:
+            print(f"   ✅ Artefact {name}: reconstruit")
+
+    COMPILED_DB_PATH.write_bytes(valid)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Génération contrainte commune aux backends du modèle de métadonnées
+(PyTorch : inference.py, ONNX Runtime : onnx_inference.py)
+
+Prompt, boucles de décodage glouton contraint (un titre, avec brouillons
+spéculatifs, ou un lot de titres) et regroupement des titres en lots.
+Un backend ne fournit que le tokenizer et les passages du modèle, qui rendent
+des logits NumPy : ni torch ni onnxruntime ici.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from constrained_json import ConstrainedDecoder, JsonObjectGrammar, add_field_logprob, format_object
+
+PROMPT_TEMPLATE = "<|user|>\nTitle: {title}\nExtract motorcycle metadata:<|end|>\n<|assistant|>\n"
+# Début commun à tous les prompts : son cache KV est calculé une seule fois.
+# Sans l'espace final, qui est fusionné avec le premier mot du titre par le tokenizer.
+# La suite du prompt vient après le titre : son cache en dépend, elle est recalculée.
+PROMPT_PREFIX = "<|user|>\nTitle:"
+
+# Nombre maximal de passages du modèle pour un objet (l'objet ferme bien avant)
+MAX_NEW_TOKENS = 150
+
+# Passage du modèle sur un titre : (tokens ajoutés au cache KV, nombre de
+# positions voulues) → logits de ces dernières positions
+Forward = Callable[[List[int], int], np.ndarray]
+# Passage du modèle sur un lot : (input_ids, attention_mask, position_ids)
+# → logits du dernier token de chaque séquence
+BatchForward = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+def anchored_token_texts(decoded: Sequence[str], anchor_text: str) -> List[str]:
+    """
+    Texte de chaque token tel qu'il apparaît en cours de génération, d'après
+    son décodage derrière un token d'ancrage (le tokenizer garde ainsi
+    l'espace initial) ; vide si spécial
+    """
+    return [
+        # Octets isolés (byte fallback) : pas de texte valide à eux seuls
+        text[len(anchor_text):] if text.startswith(anchor_text) and '\ufffd' not in text else ""
+        for text in decoded
+    ]
+
+
+def ranked_tokens(logits: np.ndarray) -> Iterable[int]:
+    """Tokens par score décroissant (les premiers suffisent presque toujours)"""
+    top = np.argpartition(-logits, 32)[:32] if len(logits) > 32 else np.arange(len(logits))
+    top = top[np.argsort(-logits[top], kind='stable')].tolist()
+    yield from top
+    seen = set(top)
+    for token_id in np.argsort(-logits, kind='stable').tolist():
+        if token_id not in seen:
+            yield token_id
+
+
+def token_logprob(logits: np.ndarray, token_id: int) -> float:
+    """Log-probabilité d'un token dans la distribution complète (non contrainte)"""
+    logits = logits.astype(np.float64)
+    top = logits.max()
+    return float(logits[token_id] - top - np.log(np.exp(logits - top).sum()))
+
+
+def draft_chain(grammar: JsonObjectGrammar, decoder: ConstrainedDecoder, state, text: str,
+                drafts: Sequence[str]) -> List[Tuple[int, bool]]:
+    """
+    Tokens à vérifier d'un bloc : suite du premier brouillon qui prolonge le
+    texte produit, découpée comme le décodage normal le ferait (suites
+    imposées, puis un token deviné à chaque choix du modèle)
+
+    Returns:
+        [(token, deviné)] ; les tokens imposés (deviné=False) n'ont pas à être vérifiés
+    """
+    draft = next((d for d in drafts if len(d) > len(text) and d.startswith(text)), None)
+    if draft is None:
+        return []
+
+    chain: List[Tuple[int, bool]] = []
+    position = len(text)
+    while not grammar.is_complete(state):
+        forced_text = grammar.forced_text(state)
+        if forced_text:
+            forced = decoder.tokenize_forced(forced_text)
+            if not forced or not draft.startswith(forced_text, position):
+                break
+            chain.extend((token_id, False) for token_id in forced)
+            state = grammar.advance(state, forced_text)
+            position += len(forced_text)
+            continue
+        guess = decoder.draft_token(state, draft[position:])
+        if guess is None:
+            break
+        token_id, state = guess
+        chain.append((token_id, True))
+        position += len(decoder.token_texts[token_id])
+    return chain
+
+
+def generate_constrained(grammar: JsonObjectGrammar, decoder: ConstrainedDecoder,
+                         forward: Forward, crop: Callable[[int], None], pending: List[int],
+                         drafts: Sequence[str] = ()) -> Tuple[Optional[str], Dict[str, float]]:
+    """
+    Décodage glouton contraint par la grammaire, avec cache KV :
+    les suites imposées (clés, ponctuation) sont ajoutées d'un bloc
+    et la génération s'arrête dès que l'objet est fermé
+
+    Décodage spéculatif avec des brouillons (objets attendus, ex : les
+    candidats de la base) : la suite d'un brouillon est passée au modèle
+    avec les tokens en attente et vérifiée en un seul passage. Les tokens
+    devinés sont gardés tant qu'ils sont le choix glouton du modèle ; au
+    premier écart, le choix du modèle est pris et le cache KV tronqué.
+    Le résultat est identique au décodage sans brouillon.
+
+    Args:
+        forward: Passage du modèle (voir Forward)
+        crop: Retire les n dernières positions du cache KV (tokens rejetés)
+        pending: Tokens du prompt pas encore dans le cache KV
+        drafts: Brouillons au format de la grammaire (format_object)
+
+    Returns:
+        (texte de l'objet ou None, log-probabilité des valeurs par champ)
+    """
+    state = grammar.start()
+    text = ""
+    field_logprobs: Dict[str, float] = {}
+    pending = list(pending)
+
+    for _ in range(MAX_NEW_TOKENS):
+        forced_text = grammar.forced_text(state)
+        forced = decoder.tokenize_forced(forced_text)
+        if forced:
+            pending.extend(forced)
+            text += forced_text
+            state = grammar.advance(state, forced_text)
+            if grammar.is_complete(state):
+                return text, field_logprobs
+
+        chain = draft_chain(grammar, decoder, state, text, drafts) if drafts else []
+        # all_logits[i] : token suivant le i-ème token du brouillon (0 : après pending)
+        all_logits = forward(pending + [token_id for token_id, _ in chain], len(chain) + 1)
+
+        # Tokens du brouillon gardés tant qu'ils sont le choix du modèle
+        cursor = 0
+        choice = None
+        for token_id, guessed in chain:
+            if guessed:
+                choice = decoder.pick(state, ranked_tokens(all_logits[cursor]))
+                if choice is None or choice[0] != token_id:
+                    break
+                add_field_logprob(field_logprobs, grammar.field_of(state),
+                                  token_logprob(all_logits[cursor], token_id))
+                choice = None
+            state = grammar.advance(state, decoder.token_texts[token_id])
+            text += decoder.token_texts[token_id]
+            cursor += 1
+            if grammar.is_complete(state):
+                return text, field_logprobs
+
+        if cursor < len(chain):
+            # Écart avec le brouillon : tokens rejetés retirés du cache
+            crop(len(chain) - cursor)
+        else:
+            choice = decoder.pick(state, ranked_tokens(all_logits[cursor]))
+
+        if choice is None:
+            return None, field_logprobs
+        token_id, next_state = choice
+        add_field_logprob(field_logprobs, grammar.field_of(state),
+                          token_logprob(all_logits[cursor], token_id))
+        state = next_state
+        text += decoder.token_texts[token_id]
+        if grammar.is_complete(state):
+            return text, field_logprobs
+        pending = [token_id]
+
+    return None, field_logprobs
+
+
+def generate_constrained_batch(grammar: JsonObjectGrammar, decoder: ConstrainedDecoder,
+                               forward: BatchForward, batch_ids: List[List[int]],
+                               pad_id: int, prefix_length: int = 0) -> List[Tuple[Optional[str], Dict[str, float]]]:
+    """
+    Même décodage contraint pour plusieurs prompts à la fois : padding à
+    gauche, masque d'attention et un token par séquence à chaque passage
+    (les suites imposées sont fournies token par token)
+
+    Args:
+        forward: Passage du modèle sur le lot (voir BatchForward)
+        batch_ids: Tokens de chaque prompt pas encore dans le cache KV
+        pad_id: Token de padding (masqué)
+        prefix_length: Longueur du préfixe déjà en cache pour chaque séquence
+    """
+    size = len(batch_ids)
+    # Padding à gauche : le dernier token de chaque prompt est aligné
+    width = max(len(ids) for ids in batch_ids)
+    input_ids = np.array([[pad_id] * (width - len(ids)) + ids for ids in batch_ids], dtype=np.int64)
+    attention_mask = np.array(
+        [[1] * prefix_length + [0] * (width - len(ids)) + [1] * len(ids) for ids in batch_ids], dtype=np.int64
+    )
+    # Positions continues malgré le padding (les tokens masqués ne comptent pas)
+    position_ids = np.maximum(attention_mask.cumsum(-1) - 1, 0)[:, prefix_length:]
+
+    states = [grammar.start()] * size
+    texts: List[Optional[str]] = [""] * size
+    field_logprobs: List[Dict[str, float]] = [{} for _ in range(size)]
+    forced_queues: List[List[int]] = [[] for _ in range(size)]
+    done = [False] * size
+
+    for _ in range(MAX_NEW_TOKENS):
+        logits = forward(input_ids, attention_mask, position_ids)
+
+        next_ids = []
+        for row in range(size):
+            if not done[row] and not forced_queues[row]:
+                forced_text = grammar.forced_text(states[row])
+                forced = decoder.tokenize_forced(forced_text)
+                if forced:
+                    forced_queues[row] = forced
+                    texts[row] += forced_text
+                    states[row] = grammar.advance(states[row], forced_text)
+                    # Objet fermé par la suite imposée : inutile de la fournir
+                    done[row] = grammar.is_complete(states[row])
+
+            if done[row]:
+                next_ids.append(pad_id)
+            elif forced_queues[row]:
+                next_ids.append(forced_queues[row].pop(0))
+            else:
+                choice = decoder.pick(states[row], ranked_tokens(logits[row]))
+                if choice is None:
+                    texts[row] = None
+                    done[row] = True
+                    next_ids.append(pad_id)
+                    continue
+                token_id, next_state = choice
+                add_field_logprob(field_logprobs[row], grammar.field_of(states[row]),
+                                  token_logprob(logits[row], token_id))
+                states[row] = next_state
+                texts[row] += decoder.token_texts[token_id]
+                done[row] = grammar.is_complete(states[row])
+                next_ids.append(token_id)
+
+        if all(done):
+            break
+
+        # Les séquences terminées ne reçoivent plus que du padding masqué
+        step_mask = np.array([[0 if finished else 1] for finished in done], dtype=np.int64)
+        attention_mask = np.concatenate([attention_mask, step_mask], axis=1)
+        position_ids = attention_mask.sum(-1, keepdims=True) - 1
+        input_ids = np.array([[token_id] for token_id in next_ids], dtype=np.int64)
+
+    return [
+        (text if text is not None and grammar.is_complete(state) else None, logprobs)
+        for text, state, logprobs in zip(texts, states, field_logprobs)
+    ]
+
+
+class ConstrainedExtractor:
+    """
+    Extraction des métadonnées par génération contrainte, commune aux backends
+
+    Une sous-classe fournit grammar, decoder, _prefix_ids (préfixe du prompt
+    en cache) et les méthodes _encode, _generate_constrained et
+    _generate_constrained_batch
+    """
+
+    def _encode(self, text: str) -> List[int]:
+        raise NotImplementedError
+
+    def _generate_constrained(self, input_ids: List[int],
+                              drafts: Sequence[str] = ()) -> Tuple[Optional[str], Dict[str, float]]:
+        raise NotImplementedError
+
+    def _generate_constrained_batch(self, batch_ids: List[List[int]]) -> List[Tuple[Optional[str], Dict[str, float]]]:
+        raise NotImplementedError
+
+    def _has_prefix(self, input_ids: List[int]) -> bool:
+        """Le prompt commence par le préfixe en cache (même découpage en tokens)"""
+        size = len(self._prefix_ids)
+        return len(input_ids) > size and input_ids[:size] == self._prefix_ids
+
+    def extract(self, title, channel="Unknown") -> Optional[Dict]:
+        """Extrait les métadonnées depuis un titre YouTube"""
+        return self.extract_scored(title)[0]
+
+    def extract_scored(self, title, drafts: Optional[List[Dict]] = None) -> Tuple[Optional[Dict], Dict[str, float]]:
+        """
+        Extrait les métadonnées avec, par champ, la log-probabilité de la valeur
+        (somme sur les tokens choisis par le modèle)
+
+        Args:
+            title: Titre YouTube
+            drafts: Métadonnées probables (ex : candidats de la base), vérifiées
+                    par décodage spéculatif ; la réponse n'en dépend pas
+        """
+        input_ids = self._encode(PROMPT_TEMPLATE.format(title=title))
+        draft_texts = [format_object(draft) for draft in drafts or ()]
+        response, field_logprobs = self._generate_constrained(input_ids, draft_texts)
+
+        metadata = self.grammar.values(response) if response else None
+        if metadata is None:
+            print(f"❌ Objet JSON incomplet après {MAX_NEW_TOKENS} tokens")
+            print(f"   Réponse brute: {response}")
+        return metadata, field_logprobs
+
+    def extract_batch(self, titles: List[str], batch_size: int = 8) -> List[Optional[Dict]]:
+        """
+        Extrait les métadonnées de plusieurs titres, par lots de longueurs voisines
+
+        Returns:
+            Une entrée par titre (None si échec), dans l'ordre des titres
+        """
+        return [metadata for metadata, _ in self.extract_batch_scored(titles, batch_size)]
+
+    def extract_batch_scored(self, titles: List[str], batch_size: int = 8,
+                             drafts: Optional[List[List[Dict]]] = None) -> List[Tuple[Optional[Dict], Dict[str, float]]]:
+        """
+        extract_batch avec les log-probabilités par champ (voir extract_scored)
+
+        Les brouillons (une liste par titre, vide sinon) ne servent qu'aux titres
+        décodés seuls (lot d'un titre) : vérifier un brouillon en mode spéculatif
+        coûte quelques passages pour ce titre, quand un lot fait avancer
+        batch_size titres à chaque passage.
+
+        Returns:
+            Un couple (métadonnées ou None, log-probabilités) par titre, dans l'ordre des titres
+        """
+        results: List[Tuple[Optional[Dict], Dict[str, float]]] = [(None, {})] * len(titles)
+        encoded = [self._encode(PROMPT_TEMPLATE.format(title=title)) for title in titles]
+        # Lots de prompts de longueurs voisines : peu de padding
+        order = sorted(range(len(titles)), key=lambda i: len(encoded[i]))
+
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            if len(bucket) == 1 and drafts and drafts[bucket[0]]:
+                results[bucket[0]] = self.extract_scored(titles[bucket[0]], drafts[bucket[0]])
+                continue
+            responses = self._generate_constrained_batch([encoded[i] for i in bucket])
+            for i, (response, field_logprobs) in zip(bucket, responses):
+                results[i] = (self.grammar.values(response) if response else None), field_logprobs
+
+        return results
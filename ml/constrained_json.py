@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Décodage contraint d'un objet JSON à champs fixes
+La sortie du modèle suit toujours le même squelette :
+    {"manufacturer": "...", "model": "...", "engine": "...", "cylinders": "...", "year": "..."}
+Les clés et la ponctuation sont imposées, chaque valeur est choisie dans un
+vocabulaire fermé (tiré de la base) ou libre (sans guillemet ni retour à la ligne).
+Le décodage s'arrête dès que l'objet est fermé.
+Les log-probabilités des tokens choisis sont cumulées par champ : exp(somme)
+est la probabilité que le modèle donne à la valeur, une confiance réelle.
+
+Tout est calculé au niveau des caractères : un token est accepté si son texte
+peut être consommé par la grammaire depuis l'état courant, ce qui évite de
+dépendre du découpage en tokens des valeurs.
+"""
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from generate_dataset import MOTOS_DATABASE
+
+DB_PATH = Path(__file__).parent / "motorcycle_database.json"
+# Sorties d'entraînement relues par la vérification de la grammaire (__main__)
+DATASET_PATHS = (
+    Path(__file__).parent / "data" / "train.jsonl",
+    Path(__file__).parent / "data" / "val.jsonl",
+)
+
+FIELDS = ("manufacturer", "model", "engine", "cylinders", "year")
+
+# Longueur maximale d'une valeur libre (le modèle n'a pas de vocabulaire fermé)
+MAX_FREE_CHARS = 48
+
+# État de la grammaire : (index du segment, texte déjà consommé dans ce segment)
+State = Tuple[int, str]
+
+
+def load_field_vocabularies(db_path: Path = DB_PATH) -> Dict[str, Optional[List[str]]]:
+    """
+    Vocabulaires fermés des champs tirés de la base et des motos du jeu
+    d'entraînement (generate_dataset.py : le modèle a appris leurs valeurs,
+    ex : "Triple CP3") ; None pour un champ libre
+
+    Le modèle reste libre : le jeu d'entraînement contient des noms absents
+    de la base (ex : "Speed Triple 1200 RR")
+    """
+    with open(db_path, 'r', encoding='utf-8') as f:
+        motorcycles = json.load(f)['motorcycles'] + MOTOS_DATABASE
+
+    manufacturers = {moto['manufacturer'] for moto in motorcycles}
+    engines = {moto['engine'] for moto in motorcycles}
+    cylinders = {str(moto['cylinders']) for moto in motorcycles}
+    # Toutes les années plausibles, pas seulement celles de la base
+    years = {str(year) for year in range(1980, 2031)}
+    years.update(str(year) for moto in motorcycles for year in moto.get('years', [moto.get('year')]))
+
+    return {
+        "manufacturer": sorted(manufacturers),
+        "model": None,
+        "engine": sorted(engines),
+        "cylinders": sorted(cylinders),
+        "year": sorted(years),
+    }
+
+
+class JsonObjectGrammar:
+    def __init__(self, vocabularies: Dict[str, Optional[Iterable[str]]],
+                 fields: Sequence[str] = FIELDS, max_free_chars: int = MAX_FREE_CHARS):
+        """
+        Args:
+            vocabularies: Valeurs autorisées par champ (None : valeur libre)
+            fields: Champs dans l'ordre de sortie
+            max_free_chars: Longueur maximale d'une valeur libre
+        """
+        self.max_free_chars = max_free_chars
+        # Segments : ("literal", texte) | ("choice", (valeurs, préfixes)) | ("free", None)
+        self.segments: List[Tuple[str, object]] = []
+        # Champ dont chaque segment porte la valeur (None pour un littéral)
+        self.segment_fields: List[Optional[str]] = []
+
+        for i, field in enumerate(fields):
+            # Le guillemet fermant la valeur précédente ouvre le littéral suivant
+            opening = '{' if i == 0 else '", '
+            self.segments.append(("literal", f'{opening}"{field}": "'))
+            options = vocabularies.get(field)
+            if options is None:
+                self.segments.append(("free", None))
+            else:
+                # Une valeur ne peut pas contenir de guillemet : il termine le champ
+                options = frozenset(option for option in options if '"' not in option)
+                prefixes = frozenset(option[:n] for option in options for n in range(len(option) + 1))
+                self.segments.append(("choice", (options, prefixes)))
+            self.segment_fields.extend((None, field))
+        self.segments.append(("literal", '"}'))
+        self.segment_fields.append(None)
+
+    def start(self) -> State:
+        return 0, ""
+
+    def is_complete(self, state: State) -> bool:
+        return state[0] == len(self.segments)
+
+    def field_of(self, state: State) -> Optional[str]:
+        """Champ dont la valeur est en cours à cet état (None dans un littéral ou à la fin)"""
+        index = state[0]
+        return self.segment_fields[index] if index < len(self.segments) else None
+
+    def advance(self, state: State, text: str) -> Optional[State]:
+        """État après consommation de text, None si text sort de la grammaire"""
+        for char in text:
+            state = self._advance_char(state, char)
+            if state is None:
+                return None
+        return state
+
+    def _advance_char(self, state: State, char: str) -> Optional[State]:
+        index, consumed = state
+        if index == len(self.segments):
+            return None
+
+        kind, spec = self.segments[index]
+        if kind == "literal":
+            if spec[len(consumed)] != char:
+                return None
+            consumed += char
+            return (index + 1, "") if consumed == spec else (index, consumed)
+
+        if char == '"':
+            # Fin de la valeur : le guillemet appartient au littéral suivant
+            complete = consumed in spec[0] if kind == "choice" else bool(consumed)
+            return self._advance_char((index + 1, ""), char) if complete else None
+
+        if kind == "choice":
+            return (index, consumed + char) if consumed + char in spec[1] else None
+
+        if char in '\\\n\r' or char < ' ' or len(consumed) >= self.max_free_chars:
+            return None
+        return index, consumed + char
+
+    def forced_text(self, state: State) -> str:
+        """
+        Suite imposée depuis l'état courant (littéraux, valeur dont il ne reste
+        qu'un choix possible) : elle peut être ajoutée sans consulter le modèle
+        """
+        forced = []
+        index, consumed = state
+        while index < len(self.segments):
+            kind, spec = self.segments[index]
+            if kind == "literal":
+                forced.append(spec[len(consumed):])
+            elif kind == "choice":
+                remaining = [option for option in spec[0] if option.startswith(consumed)]
+                # Plusieurs suites possibles (y compris s'arrêter ici) : le modèle choisit
+                if len(remaining) != 1:
+                    break
+                forced.append(remaining[0][len(consumed):])
+            else:
+                break
+            index, consumed = index + 1, ""
+        return ''.join(forced)
+
+    def values(self, text: str) -> Optional[Dict[str, str]]:
+        """Décode l'objet produit (None s'il est incomplet)"""
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+
+
+def format_object(values: Dict[str, object], fields: Sequence[str] = FIELDS) -> str:
+    """Objet tel que la grammaire le produit (mêmes clés, ordre et séparateurs)"""
+    return json.dumps({field: str(values.get(field, "")) for field in fields}, ensure_ascii=False)
+
+
+def add_field_logprob(field_logprobs: Dict[str, float], field: Optional[str], logprob: float):
+    """
+    Cumule la log-probabilité d'un token choisi par le modèle dans le champ
+    où il commence (les suites imposées, certaines, n'y contribuent pas)
+    """
+    if field is not None:
+        field_logprobs[field] = field_logprobs.get(field, 0.0) + logprob
+
+
+class ConstrainedDecoder:
+    def __init__(self, token_texts: Sequence[str], grammar: JsonObjectGrammar):
+        """
+        Args:
+            token_texts: Texte de chaque token du vocabulaire (vide si spécial)
+            grammar: Grammaire de la sortie
+        """
+        self.token_texts = token_texts
+        self.grammar = grammar
+        # Texte → token, pour découper les suites imposées sans le tokenizer
+        self._by_text: Dict[str, int] = {}
+        for token_id, text in enumerate(token_texts):
+            if text and text not in self._by_text:
+                self._by_text[text] = token_id
+        self._max_token_chars = max((len(text) for text in self._by_text), default=1)
+
+    def pick(self, state: State, ranked_ids: Iterable[int]) -> Optional[Tuple[int, State]]:
+        """Premier token (par score décroissant) accepté par la grammaire"""
+        for token_id in ranked_ids:
+            text = self.token_texts[token_id]
+            if not text:
+                continue
+            next_state = self.grammar.advance(state, text)
+            if next_state is not None:
+                return token_id, next_state
+        return None
+
+    def tokenize_forced(self, text: str) -> List[int]:
+        """Découpe une suite imposée en tokens (plus long préfixe d'abord ; [] si impossible)"""
+        token_ids = []
+        position = 0
+        while position < len(text):
+            for length in range(min(self._max_token_chars, len(text) - position), 0, -1):
+                token_id = self._by_text.get(text[position:position + length])
+                if token_id is not None:
+                    token_ids.append(token_id)
+                    position += length
+                    break
+            else:
+                return []
+        return token_ids
+
+    def draft_token(self, state: State, text: str) -> Optional[Tuple[int, State]]:
+        """
+        Token devinant la suite d'un brouillon : plus long préfixe de text
+        qui soit un token accepté par la grammaire (None s'il n'y en a pas)
+        """
+        for length in range(min(self._max_token_chars, len(text)), 0, -1):
+            token_id = self._by_text.get(text[:length])
+            if token_id is None:
+                continue
+            next_state = self.grammar.advance(state, text[:length])
+            if next_state is not None:
+                return token_id, next_state
+        return None
+
+
+def check_dataset(grammar: JsonObjectGrammar, paths: Sequence[Path] = DATASET_PATHS) -> List[str]:
+    """
+    Passe chaque sortie du jeu d'entraînement dans la grammaire : une sortie
+    rejetée serait impossible à produire pour le modèle contraint
+
+    Returns:
+        Sorties rejetées ("fichier:ligne: sortie")
+    """
+    rejected = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                output = json.loads(line)["output"]
+                state = grammar.advance(grammar.start(), output)
+                if state is None or not grammar.is_complete(state):
+                    rejected.append(f"{path.name}:{number}: {output}")
+    return rejected
+
+
+if __name__ == "__main__":
+    rejected = check_dataset(JsonObjectGrammar(load_field_vocabularies()))
+    for entry in rejected:
+        print(f"❌ {entry}")
+    if rejected:
+        print(f"❌ {len(rejected)} sortie(s) d'entraînement rejetée(s) par la grammaire")
+        sys.exit(1)
+    print("✅ Toutes les sorties d'entraînement sont acceptées par la grammaire")
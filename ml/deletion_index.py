@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Index de suppressions (à la SymSpell) pour la recherche approximative de mots
+Retrouve les mots de la base à distance d'édition ≤ k d'un mot du titre
+par simples lookups, sans comparer le mot à tout le vocabulaire
+"""
+from typing import Dict, List, Set, Tuple
+
+
+def levenshtein(a: str, b: str) -> int:
+    """
+    Distance d'édition (insertion, suppression, substitution, et inversion de
+    deux lettres voisines comptée pour une : "monstre" est à 1 de "monster")
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                distance = min(distance, before[j - 2] + 1)
+            current.append(distance)
+        before, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """Toutes les variantes du mot obtenues par au plus max_distance suppressions"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class DeletionIndex:
+    def __init__(self, max_distance: int = 2):
+        self.max_distance = max_distance
+        # Suppression → mots du vocabulaire qui la produisent
+        self._deletes: Dict[str, List[str]] = {}
+        self._words: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._words
+
+    def add(self, word: str):
+        """Ajoute un mot au vocabulaire"""
+        if word in self._words:
+            return
+        self._words.add(word)
+        for deleted in _deletes(word, self.max_distance):
+            self._deletes.setdefault(deleted, []).append(word)
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, str]]:
+        """
+        Mots du vocabulaire à distance ≤ max_distance
+
+        Returns:
+            Liste de (distance, mot), plus proches d'abord
+        """
+        max_distance = min(max_distance, self.max_distance)
+        candidates = set()
+        for deleted in _deletes(word, max_distance):
+            candidates.update(self._deletes.get(deleted, ()))
+
+        results = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = levenshtein(word, candidate)
+            if distance <= max_distance:
+                results.append((distance, candidate))
+
+        results.sort()
+        return results
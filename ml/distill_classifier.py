@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Distillation de l'extracteur (base + Phi-3) vers un classifieur linéaire léger
+
+1. Corpus : titres réels (jeu d'entraînement, --input) étiquetés par
+   l'extracteur hybride puis, avec --teacher-ai, par le modèle Phi-3 pour
+   ceux que la base ne résout pas ; titres synthétiques bruités (fautes,
+   fabricant omis, casse) tirés des noms de la base, étiquetés par construction
+2. Régression softmax sur mots + n-grammes de caractères (NumPy/SciPy)
+3. Élagage des poids, puis calibration de la température sur un jeu
+   de validation avec le prédicteur élagué
+4. Sauvegarde dans models/title_classifier.json (chargé par hybrid_extractor)
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from generate_dataset import TITLE_TEMPLATES
+from hybrid_extractor import CLASSIFIER_PATH, HybridMotorcycleExtractor
+from title_classifier import TitleClassifier, title_features
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# Suffixes ajoutés aux titres synthétiques (comme generate_dataset.py)
+SUFFIXES = ["", " | Exhaust", " - Cold Start", " (4K)", " - FULL VIDEO", " onboard", " POV ride"]
+
+# Titres sans moto identifiable (classe "aucune")
+NEGATIVE_TITLES = [
+    "Best exhaust sound compilation {year}",
+    "Top 10 loudest motorcycles",
+    "Motorcycle sounds - cold start compilation",
+    "Sunday ride POV",
+    "My first track day {year}",
+    "Akrapovic vs stock exhaust",
+    "Superbike fly by sound",
+    "Street racing compilation {year}",
+    "Motovlog #{n} - new helmet",
+    "Crash compilation {year}",
+    "How to change your oil",
+    "Dyno run sound",
+]
+
+# Nombre maximal de poids gardés par caractéristique après élagage
+MAX_WEIGHTS_PER_FEATURE = 6
+# Poids plus petits (en valeur absolue) supprimés
+MIN_WEIGHT = 0.05
+
+
+def add_typo(word: str, rng: random.Random) -> str:
+    """Une faute de frappe : lettre supprimée, doublée ou interversion"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i] + word[i:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+
+def synthetic_titles(extractor: HybridMotorcycleExtractor, per_name: int,
+                     rng: random.Random) -> List[Tuple[str, Optional[int]]]:
+    """Titres générés depuis les noms de la base, étiquetés par construction"""
+    examples = []
+    for entry in extractor._entries:
+        moto = entry["moto"]
+        names = [moto['model']] + [v for v in moto.get('variants', []) if len(v) > 2]
+        for name in names:
+            for _ in range(per_name):
+                model = name
+                if rng.random() < 0.3:
+                    model = ' '.join(add_typo(word, rng) for word in name.split(' '))
+                # Fabricant omis dans une partie des titres (cas fréquent des fallbacks)
+                manufacturer = moto['manufacturer'] if rng.random() < 0.6 else ""
+                title = rng.choice(TITLE_TEMPLATES).format(
+                    manufacturer=manufacturer, model=model, engine=moto['engine'],
+                    cylinders=moto['cylinders'], year=rng.choice(moto['years']),
+                ) + rng.choice(SUFFIXES)
+                if rng.random() < 0.2:
+                    title = title.upper() if rng.random() < 0.5 else title.lower()
+                examples.append((title, entry["position"]))
+
+    for template in NEGATIVE_TITLES:
+        for _ in range(per_name * 4):
+            title = template.format(year=rng.randrange(2000, 2026), n=rng.randrange(1, 300))
+            examples.append((title + rng.choice(SUFFIXES), None))
+
+    # Fabricant connu, modèle absent de la base : doit partir vers le fallback IA
+    known = {word for entry in extractor._entries for name in [entry["model_norm"]] + entry["variants_norm"]
+             for word in name.split(' ')}
+    for manufacturer, _ in extractor._manufacturers:
+        for _ in range(per_name * 3):
+            model = fake_model_name(rng)
+            if any(word in known for word in model.lower().split(' ')):
+                continue
+            title = rng.choice(TITLE_TEMPLATES).format(
+                manufacturer=manufacturer, model=model, engine="", cylinders="",
+                year=rng.randrange(1990, 2026),
+            ) + rng.choice(SUFFIXES)
+            examples.append((title, None))
+
+    # Code voisin d'un code de la base ("MT-03" pour "MT-07") : autre moto, hors base
+    for entry in extractor._entries:
+        moto = entry["moto"]
+        for name in [moto['model']] + moto.get('variants', []):
+            for _ in range(per_name):
+                model = altered_code(name, rng)
+                if model is None or any(word in known for word in extractor._normalize_text(model).split(' ')
+                                        if any(char.isdigit() for char in word)):
+                    continue
+                manufacturer = moto['manufacturer'] if rng.random() < 0.6 else ""
+                title = rng.choice(TITLE_TEMPLATES).format(
+                    manufacturer=manufacturer, model=model, engine="", cylinders="",
+                    year=rng.randrange(1990, 2026),
+                ) + rng.choice(SUFFIXES)
+                examples.append((title, None))
+    return examples
+
+
+def altered_code(name: str, rng: random.Random) -> Optional[str]:
+    """Nom dont un chiffre du code a changé ("MT-07" → "MT-03") ; None sans chiffre"""
+    digits = [i for i, char in enumerate(name) if char.isdigit()]
+    if not digits:
+        return None
+    i = rng.choice(digits)
+    return name[:i] + rng.choice([d for d in "0123456789" if d != name[i]]) + name[i + 1:]
+
+
+def fake_model_name(rng: random.Random) -> str:
+    """Nom de modèle plausible : mot inventé et/ou code alphanumérique"""
+    letters = "abcdefghiklmnoprstuvz"
+    word = ''.join(rng.choice(letters) for _ in range(rng.randrange(4, 8))).capitalize()
+    code = ''.join(rng.choice("ABCDEFGHKLMRSTVXZ") for _ in range(rng.randrange(1, 4))) + str(rng.randrange(50, 1900))
+    return rng.choice([word, code, f"{word} {code}", f"{word} {rng.choice(letters).upper()}{word[:3].lower()}"])
+
+
+def read_titles(paths: List[Path]) -> List[str]:
+    """Titres des fichiers JSONL : jeu d'entraînement ({"input": "Title: ..."}), titre JSON ou {"title": ...}"""
+    titles = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if isinstance(record, str):
+                    titles.append(record)
+                elif "title" in record:
+                    titles.append(record["title"])
+                elif "input" in record:
+                    titles.append(record["input"].split('\n')[0].removeprefix("Title: "))
+    return titles
+
+
+def label_titles(extractor: HybridMotorcycleExtractor, titles: List[str], teacher_ai: bool,
+                 min_confidence: float) -> List[Tuple[str, Optional[int]]]:
+    """Étiquette les titres réels avec l'extracteur (base, puis Phi-3 pour le reste)"""
+    positions = {(e["moto"]['manufacturer'], e["moto"]['model']): e["position"] for e in extractor._entries}
+
+    def position_of(metadata: Optional[Dict]) -> Optional[int]:
+        return positions.get((metadata['manufacturer'], metadata['model'])) if metadata else None
+
+    examples = []
+    unresolved = []
+    for title, (metadata, confidence) in zip(titles, extractor.extract_many(titles, use_ai_fallback=False)):
+        if metadata is not None and confidence >= min_confidence:
+            examples.append((title, position_of(metadata)))
+        else:
+            unresolved.append(title)
+
+    # Sans modèle IA, les titres non résolus restent dans la classe "aucune" (fallback)
+    if not teacher_ai:
+        return examples + [(title, None) for title in unresolved]
+
+    if unresolved:
+        print(f"🤖 Étiquetage de {len(unresolved)} titres par le modèle IA...")
+        for title, (metadata, _) in zip(unresolved, extractor.ai_fallback_many(unresolved)):
+            if metadata is None:
+                continue
+            # Réponse du modèle ramenée à une entrée de la base ; hors base → "aucune"
+            name = f"{metadata.get('manufacturer', '')} {metadata.get('model', '')}"
+            resolved, confidence = extractor.extract(name, use_ai_fallback=False)
+            examples.append((title, position_of(resolved) if confidence >= min_confidence else None))
+    return examples
+
+
+def train(X: sparse.csr_matrix, y: np.ndarray, n_classes: int, epochs: int,
+          learning_rate: float, l2: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Régression softmax, gradient complet avec Adam"""
+    n_samples, n_features = X.shape
+    W = np.zeros((n_features, n_classes))
+    b = np.zeros(n_classes)
+    Y = np.zeros((n_samples, n_classes))
+    Y[np.arange(n_samples), y] = 1.0
+
+    moments = [[np.zeros_like(W), np.zeros_like(W)], [np.zeros_like(b), np.zeros_like(b)]]
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    for epoch in range(1, epochs + 1):
+        logits = X @ W + b
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        delta = (probs - Y) / n_samples
+        grads = [X.T @ delta + l2 * W, delta.sum(axis=0)]
+
+        for param, grad, (m, v) in zip((W, b), grads, moments):
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad ** 2
+            param -= learning_rate * (m / (1 - beta1 ** epoch)) / (np.sqrt(v / (1 - beta2 ** epoch)) + eps)
+
+        if epoch % 50 == 0:
+            loss = -np.log(probs[np.arange(n_samples), y] + 1e-12).mean()
+            print(f"   epoch {epoch}: loss {loss:.4f}")
+    return W, b
+
+
+def prune(W: np.ndarray, features: List[str]) -> Dict[str, List[Tuple[int, float]]]:
+    """
+    Garde les poids les plus forts de chaque caractéristique
+
+    Une constante ajoutée à toutes les classes ne change pas la softmax :
+    chaque ligne est d'abord centrée sur sa médiane pour que la plupart
+    des poids deviennent négligeables
+    """
+    W = W - np.median(W, axis=1, keepdims=True)
+    weights = {}
+    for row, feature in zip(W, features):
+        top = np.argsort(-np.abs(row))[:MAX_WEIGHTS_PER_FEATURE]
+        kept = [(int(c), round(float(row[c]), 4)) for c in top if abs(row[c]) >= MIN_WEIGHT]
+        if kept:
+            weights[feature] = kept
+    return weights
+
+
+def calibrate(classifier: TitleClassifier, titles: List[str], labels: List[int]) -> float:
+    """Température minimisant la log-vraisemblance négative sur la validation"""
+    logits = np.array([classifier.logits(title) for title in titles])
+    logits -= logits.max(axis=1, keepdims=True)
+    labels = np.array(labels)
+    best = (float('inf'), 1.0)
+    for temperature in np.exp(np.linspace(np.log(0.1), np.log(10.0), 81)):
+        scaled = logits / temperature
+        log_norm = np.log(np.exp(scaled).sum(axis=1))
+        nll = (log_norm - scaled[np.arange(len(labels)), labels]).mean()
+        best = min(best, (nll, float(temperature)))
+    return best[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distill the extractor into a lightweight title classifier')
+    parser.add_argument('--input', type=Path, nargs='*', default=[],
+                        help='Extra JSONL title corpora (JSON strings or {"title": ...})')
+    parser.add_argument('--teacher-ai', action='store_true',
+                        help='Label titles the database cannot resolve with the Phi-3 model')
+    parser.add_argument('--min-confidence', type=float, default=0.85,
+                        help='Minimum teacher confidence to keep a label')
+    parser.add_argument('--synthetic-per-name', type=int, default=12,
+                        help='Synthetic titles per model/variant name')
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--learning-rate', type=float, default=0.05)
+    parser.add_argument('--l2', type=float, default=1e-5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=CLASSIFIER_PATH)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Le classifieur en place ne doit pas étiqueter son propre corpus
+    extractor = HybridMotorcycleExtractor(verbose=False, classifier_path=None)
+
+    print("🏗️  Construction du corpus...")
+    titles = read_titles(sorted(DATA_DIR.glob("*.jsonl")) + list(args.input))
+    examples = label_titles(extractor, titles, args.teacher_ai, args.min_confidence)
+    print(f"   {len(examples)} titres réels étiquetés sur {len(titles)}")
+    examples += synthetic_titles(extractor, args.synthetic_per_name, rng)
+    rng.shuffle(examples)
+    print(f"   {len(examples)} exemples au total")
+
+    # Classes : positions de la base, puis "aucune"
+    classes: List[Optional[int]] = [entry["position"] for entry in extractor._entries] + [None]
+    class_index = {position: i for i, position in enumerate(classes)}
+    norms = [extractor._normalize_text(title) for title, _ in examples]
+    labels = [class_index[position] for _, position in examples]
+
+    split = int(len(examples) * 0.9)
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for i, norm in enumerate(norms[:split]):
+        for feature in set(title_features(norm)):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(feature, len(vocabulary)))
+    X = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(split, len(vocabulary)))
+    print(f"🎓 Entraînement : {split} exemples, {len(vocabulary)} caractéristiques, {len(classes)} classes")
+
+    W, b = train(X, np.array(labels[:split]), len(classes), args.epochs, args.learning_rate, args.l2)
+    features = sorted(vocabulary, key=vocabulary.get)
+    classifier = TitleClassifier(classes, [round(float(v), 4) for v in b - np.median(b)],
+                                 prune(W, features), db_version=extractor.db_version)
+    classifier.temperature = calibrate(classifier, norms[split:], labels[split:])
+
+    # Évaluation sur la validation, avec le prédicteur en Python pur
+    start = time.perf_counter()
+    predictions = [classifier.predict(norm) for norm in norms[split:]]
+    elapsed = time.perf_counter() - start
+    held_out = list(zip(predictions, labels[split:]))
+    correct = sum(classes[label] == position for (position, _), label in held_out)
+    # Réponses gardées par l'extracteur (probabilité au seuil d'acceptation), les autres vont à l'IA
+    threshold = extractor.confidence_threshold
+    confident = [(position, label) for (position, p), label in held_out if p >= threshold]
+    confident_correct = sum(classes[label] == position for position, label in confident)
+
+    print(f"📊 Validation : {correct}/{len(held_out)} ({correct / len(held_out):.2%})")
+    print(f"   Probabilité ≥ {threshold:.0%} : {len(confident)} titres, précision "
+          f"{confident_correct / max(1, len(confident)):.2%}")
+    print(f"   Température : {classifier.temperature:.3f}, "
+          f"{sum(len(w) for w in classifier.weights.values())} poids gardés")
+    print(f"   ⚡ {elapsed / len(held_out) * 1e6:.1f} µs par titre")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    classifier.save(args.output)
+    print(f"✅ Classifieur sauvegardé : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Fusionne les adaptateurs LoRA dans Phi-3 et sauvegarde un checkpoint unique
+(safetensors, projeté en mémoire au chargement)
+
+MotoMetadataExtractor le charge ensuite directement, sans PeftModel :
+chargement plus court et pas de couches LoRA à chaque passage du modèle
+"""
+import argparse
+import time
+
+import torch
+
+from inference import MERGED_DIR, MODEL_DIR, export_merged
+
+DTYPES = {"bfloat16": torch.bfloat16, "float16": torch.float16, "float32": torch.float32}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the LoRA-merged metadata model')
+    parser.add_argument('--model-path', default=MODEL_DIR, help='LoRA adapter directory')
+    parser.add_argument('--output', default=MERGED_DIR, help='Merged checkpoint directory')
+    parser.add_argument('--dtype', choices=sorted(DTYPES), default='bfloat16', help='Saved weight dtype')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    weights = export_merged(args.model_path, args.output, DTYPES[args.dtype])
+    export_time = time.perf_counter() - start
+
+    print(f"✅ Modèle fusionné: {weights}")
+    print(f"   Type:            {args.dtype}")
+    print(f"   Taille:          {weights.stat().st_size / 1024 ** 3:.2f} GB")
+    print(f"   Export:          {export_time:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
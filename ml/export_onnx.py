@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Exporte le modèle fusionné (Phi-3 + LoRA, ou tout successeur au format
+Hugging Face) en graphe ONNX avec cache KV en entrée et en sortie,
+puis quantifie les poids en int8 pour onnxruntime (CPU)
+
+Le dossier produit suffit à onnx_inference.OnnxMotoMetadataExtractor :
+graphe int8, dimensions du cache et tokenizer (sans torch au service)
+"""
+import argparse
+import json
+import shutil
+import time
+from pathlib import Path
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from inference import MERGED_DIR
+from onnx_inference import ONNX_CONFIG, ONNX_DIR, ONNX_MODEL
+
+# Graphe float32 intermédiaire, dans un sous-dossier (gardé avec --keep-float)
+FLOAT_MODEL = "model.onnx"
+OPSET = 17
+
+
+class DecoderWithPast(torch.nn.Module):
+    """Passage du modèle avec le cache KV aplati en tenseurs (clés, valeurs de chaque couche)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, position_ids, *past):
+        legacy = tuple((past[i], past[i + 1]) for i in range(0, len(past), 2))
+        try:
+            from transformers import DynamicCache
+            cache = DynamicCache.from_legacy_cache(legacy)
+        except ImportError:
+            cache = legacy
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=cache,
+            use_cache=True
+        )
+        present = outputs.past_key_values
+        if hasattr(present, "to_legacy_cache"):
+            present = present.to_legacy_cache()
+        return (outputs.logits, *[tensor for layer in present for tensor in layer])
+
+
+def export_onnx(model_path: str, output_dir: Path, keep_float: bool = False) -> Path:
+    """
+    Returns:
+        Chemin du graphe int8
+    """
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        trust_remote_code=True,
+        torch_dtype=torch.float32,
+        low_cpu_mem_usage=True,
+        # Attention explicite : traçable, contrairement aux noyaux fusionnés
+        attn_implementation="eager"
+    )
+    model.eval()
+    config = model.config
+    num_layers = config.num_hidden_layers
+    num_heads = config.num_attention_heads
+    num_kv_heads = getattr(config, "num_key_value_heads", None) or num_heads
+    head_dim = config.hidden_size // num_heads
+
+    past_names = [f"past_key_values.{i}.{kind}" for i in range(num_layers) for kind in ("key", "value")]
+    present_names = [f"present.{i}.{kind}" for i in range(num_layers) for kind in ("key", "value")]
+
+    # Entrées d'exemple : 3 nouveaux tokens après un cache de 5
+    past = [torch.zeros(1, num_kv_heads, 5, head_dim) for _ in past_names]
+    input_ids = torch.ones(1, 3, dtype=torch.long)
+    attention_mask = torch.ones(1, 8, dtype=torch.long)
+    position_ids = torch.arange(5, 8).unsqueeze(0)
+
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "total_sequence"},
+        "position_ids": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch", 1: "sequence"},
+    }
+    dynamic_axes.update({name: {0: "batch", 2: "past_sequence"} for name in past_names})
+    dynamic_axes.update({name: {0: "batch", 2: "total_sequence"} for name in present_names})
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Plus de 2 Go de poids : torch les écrit à côté du graphe (données externes)
+    float_dir = output_dir / "float32"
+    float_dir.mkdir(exist_ok=True)
+    float_path = float_dir / FLOAT_MODEL
+
+    print(f"📤 Export ONNX ({num_layers} couches, opset {OPSET})...")
+    with torch.no_grad():
+        torch.onnx.export(
+            DecoderWithPast(model),
+            (input_ids, attention_mask, position_ids, *past),
+            str(float_path),
+            input_names=["input_ids", "attention_mask", "position_ids", *past_names],
+            output_names=["logits", *present_names],
+            dynamic_axes=dynamic_axes,
+            opset_version=OPSET,
+        )
+    del model
+
+    # Poids int8, activations quantifiées à la volée (comme le backend CPU torch)
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print("🗜️  Quantification int8 des poids...")
+    graph_path = output_dir / ONNX_MODEL
+    quantize_dynamic(
+        str(float_path),
+        str(graph_path),
+        weight_type=QuantType.QInt8,
+        use_external_data_format=True,
+    )
+    if not keep_float:
+        shutil.rmtree(float_dir)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    with open(output_dir / ONNX_CONFIG, 'w', encoding='utf-8') as f:
+        json.dump({
+            "num_layers": num_layers,
+            "num_kv_heads": num_kv_heads,
+            "head_dim": head_dim,
+            "past_names": past_names,
+            "present_names": present_names,
+            # Padding des lots (masqué)
+            "pad_token_id": pad_id,
+        }, f, indent=2)
+    tokenizer.save_pretrained(output_dir)
+    return graph_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the merged metadata model to ONNX with KV-cache I/O')
+    parser.add_argument('--model-path', default=MERGED_DIR,
+                        help='Merged Hugging Face checkpoint (see export_merged_model.py)')
+    parser.add_argument('--output', type=Path, default=Path(ONNX_DIR), help='ONNX output directory')
+    parser.add_argument('--keep-float', action='store_true', help='Keep the float32 graph next to the int8 one')
+    args = parser.parse_args()
+
+    if not (Path(args.model_path) / "config.json").exists():
+        parser.error(f"{args.model_path}: pas de checkpoint fusionné (lancer export_merged_model.py)")
+
+    start = time.perf_counter()
+    graph = export_onnx(args.model_path, args.output, keep_float=args.keep_float)
+    export_time = time.perf_counter() - start
+
+    size = sum(path.stat().st_size for path in graph.parent.glob(f"{graph.name}*"))
+    print(f"✅ Modèle ONNX: {graph}")
+    print("   Poids:           int8")
+    print(f"   Taille:          {size / 1024 ** 3:.2f} GB")
+    print(f"   Export:          {export_time:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
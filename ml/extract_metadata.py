@@ -3,59 +3,184 @@
 Script CLI pour extraire les métadonnées de motos
 Utilisé par le backend Node.js
 """
+import sys
+
+# --explain-startup : le chronométrage doit être installé avant les autres imports
+PROFILER = None
+if '--explain-startup' in sys.argv:
+    from startup_profile import StartupProfiler
+    PROFILER = StartupProfiler()
+    PROFILER.install()
+
 import argparse
 import json
-import sys
-from hybrid_extractor import HybridMotorcycleExtractor
+import os
+import sqlite3
+from contextlib import nullcontext
+from pathlib import Path
 
-def main():
-    parser = argparse.ArgumentParser(description='Extract motorcycle metadata from YouTube title')
-    parser.add_argument('--title', required=True, help='YouTube video title')
-    parser.add_argument('--min-confidence', type=float, default=0.90, help='Minimum confidence threshold')
-    parser.add_argument('--no-ai-fallback', action='store_true', help='Disable AI fallback')
-    parser.add_argument('--quiet', action='store_true', help='Suppress debug output')
+from extraction_cache import SQLiteCache, content_key, extraction_version
+from title_classifier import CLASSIFIER_PATH
 
-    args = parser.parse_args()
+ML_DIR = Path(__file__).parent
+DB_PATH = ML_DIR / "motorcycle_database.json"
+# Cache persistant partagé entre les invocations, à côté du modèle
+CACHE_PATH = ML_DIR / "models" / "extraction_cache.sqlite"
+
+
+def phase(name: str):
+    """Phase chronométrée avec --explain-startup (sans effet sinon)"""
+    return PROFILER.phase(name) if PROFILER else nullcontext()
+
+
+def run_extraction(args) -> dict:
+    """Lance l'extracteur hybride (import seulement si le cache n'a pas répondu)"""
+    with phase("import hybrid_extractor"):
+        from hybrid_extractor import HybridMotorcycleExtractor
 
     # Rediriger stderr vers /dev/null si mode quiet
     if args.quiet:
-        import os
         import contextlib
 
         # Rediriger stdout et stderr temporairement
         with open(os.devnull, 'w') as devnull:
             with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
                 # Initialiser l'extracteur (mode silencieux si --quiet)
-                extractor = HybridMotorcycleExtractor(
-                    confidence_threshold=args.min_confidence,
-                    verbose=False
-                )
+                with phase("init extracteur"):
+                    extractor = HybridMotorcycleExtractor(
+                        confidence_threshold=args.min_confidence,
+                        verbose=False
+                    )
 
                 # Extraire les métadonnées
                 use_ai = not args.no_ai_fallback
-                metadata, confidence = extractor.extract(args.title, use_ai_fallback=use_ai)
+                with phase("extraction"):
+                    metadata, confidence = extractor.extract(args.title, use_ai_fallback=use_ai)
     else:
         # Initialiser l'extracteur
-        extractor = HybridMotorcycleExtractor(
-            confidence_threshold=args.min_confidence,
-            verbose=True
-        )
+        with phase("init extracteur"):
+            extractor = HybridMotorcycleExtractor(
+                confidence_threshold=args.min_confidence,
+                verbose=True
+            )
 
         # Extraire les métadonnées
         use_ai = not args.no_ai_fallback
-        metadata, confidence = extractor.extract(args.title, use_ai_fallback=use_ai)
+        with phase("extraction"):
+            metadata, confidence = extractor.extract(args.title, use_ai_fallback=use_ai)
 
     # Déterminer si on doit skip
     should_skip = metadata is None or confidence < args.min_confidence
 
-    # Résultat en JSON
-    result = {
+    return {
         "metadata": metadata,
         "confidence": confidence,
         "should_skip": should_skip
     }
 
+
+def main():
+    if PROFILER:
+        PROFILER.phases.append(("imports CLI", PROFILER.elapsed()))
+
+    parser = argparse.ArgumentParser(description='Extract motorcycle metadata from YouTube title')
+    parser.add_argument('--title', help='YouTube video title')
+    parser.add_argument('--min-confidence', type=float, default=0.90, help='Minimum confidence threshold')
+    parser.add_argument('--no-ai-fallback', action='store_true', help='Disable AI fallback')
+    parser.add_argument('--quiet', action='store_true', help='Suppress debug output')
+    parser.add_argument('--cache-path', type=Path, default=CACHE_PATH, help='Persistent cache file (SQLite)')
+    parser.add_argument('--cache-max-entries', type=int, default=50000, help='Maximum number of cached results')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the persistent cache')
+    parser.add_argument('--cache-stats', action='store_true', help='Print cache statistics and exit')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Serve newline-delimited JSON requests on stdin/stdout')
+    parser.add_argument('--socket', help='With --daemon, listen on this Unix socket instead')
+    parser.add_argument('--serve', action='store_true', help='Serve the HTTP extraction API')
+    parser.add_argument('--host', default='127.0.0.1', help='With --serve, address to bind')
+    parser.add_argument('--port', type=int, default=8765, help='With --serve, port to bind')
+    parser.add_argument('--queue-size', type=int, default=256, help='With --serve, max queued titles')
+    parser.add_argument('--request-timeout', type=float, default=30.0,
+                        help='With --serve, per-request timeout in seconds')
+    parser.add_argument('--ai-batch-size', type=int, default=8,
+                        help='With --serve, max titles per AI forward pass')
+    parser.add_argument('--explain-startup', action='store_true',
+                        help='Print an import-time and phase breakdown to stderr')
+    parser.add_argument('--ai-device', choices=['auto', 'cpu', 'cuda', 'onnx'],
+                        help='AI fallback backend (default: $MOTO_AI_DEVICE or auto)')
+    parser.add_argument('--ai-threads', type=int, help='AI fallback CPU threads (default: $MOTO_AI_THREADS)')
+
+    args = parser.parse_args()
+
+    # Lues au chargement du modèle (différé jusqu'au premier fallback IA)
+    if args.ai_device:
+        os.environ["MOTO_AI_DEVICE"] = args.ai_device
+    if args.ai_threads:
+        os.environ["MOTO_AI_THREADS"] = str(args.ai_threads)
+
+    if args.serve:
+        if args.queue_size < 1:
+            parser.error('--queue-size must be at least 1')
+        from extraction_http import run_http_server
+        run_http_server(
+            args.min_confidence, args.host, args.port,
+            queue_size=args.queue_size,
+            request_timeout=args.request_timeout,
+            ai_batch_size=args.ai_batch_size,
+        )
+        return 0
+
+    if args.daemon:
+        from extraction_daemon import run_daemon
+        run_daemon(args.min_confidence, args.socket)
+        return 0
+
+    if not args.title and not args.cache_stats:
+        parser.error('--title is required')
+
+    cache = None
+    if not args.no_cache or args.cache_stats:
+        with phase("ouverture du cache"):
+            try:
+                args.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                cache = SQLiteCache(args.cache_path, extraction_version(DB_PATH, CLASSIFIER_PATH),
+                                    args.cache_max_entries)
+            except (OSError, sqlite3.Error) as e:
+                # Cache inaccessible (droits, disque, fichier corrompu) : extraction sans cache
+                print(f"⚠️  Cache désactivé ({args.cache_path}): {e}", file=sys.stderr)
+
+    if args.cache_stats:
+        if cache is None:
+            return 1
+        print(json.dumps(cache.stats(), ensure_ascii=False))
+        return 0
+
+    # Clé adressée par contenu : titre + paramètres (base, classifieur et
+    # code d'extraction : version portée par le cache)
+    use_ai = not args.no_ai_fallback
+    key = content_key(args.title, args.min_confidence, use_ai)
+
+    result = None
+    if cache:
+        with phase("lecture du cache"):
+            try:
+                result = cache.get(key)
+            except sqlite3.Error as e:
+                print(f"⚠️  Lecture du cache impossible: {e}", file=sys.stderr)
+    if result is None:
+        result = run_extraction(args)
+        # Un échec avec fallback IA peut venir d'un modèle indisponible : pas de cache
+        if cache and (result["metadata"] is not None or not use_ai):
+            try:
+                cache.put(key, result)
+            except sqlite3.Error as e:
+                print(f"⚠️  Écriture du cache impossible: {e}", file=sys.stderr)
+
+    # Résultat en JSON
     print(json.dumps(result, ensure_ascii=False))
+
+    if PROFILER:
+        PROFILER.uninstall()
+        print(PROFILER.report(), file=sys.stderr)
     return 0
 
 if __name__ == '__main__':
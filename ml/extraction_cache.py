@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Cache des résultats d'extraction
+LRU borné en mémoire + niveau optionnel sur disque (SQLite)
+Les entrées sont liées à la version des résultats : hash de
+motorcycle_database.json, du classifieur distillé et du code d'extraction
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+# Modules dont le code décide des résultats (matching, classifieur, décodage
+# et confiance IA) : modifier l'un d'eux invalide le cache
+EXTRACTION_SOURCES = (
+    "hybrid_extractor.py", "aho_corasick.py", "ngram_index.py", "deletion_index.py",
+    "vector_index.py", "title_classifier.py", "constrained_json.py",
+    "constrained_generation.py", "inference.py", "onnx_inference.py",
+)
+
+
+def database_version(path: Path) -> str:
+    """Version de la base = hash de son contenu"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def source_version(names: Iterable[str]) -> str:
+    """Hash du code source de modules du dossier ml/"""
+    digest = hashlib.sha256()
+    for name in names:
+        with open(Path(__file__).parent / name, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def extraction_version(db_path: Path, classifier_path: Optional[Path] = None) -> str:
+    """
+    Version des résultats d'extraction : base, classifieur distillé (absent : "-")
+    et code d'extraction. Réentraîner le classifieur ou modifier le matching
+    invalide le cache
+    """
+    classifier = "-"
+    if classifier_path is not None and Path(classifier_path).exists():
+        classifier = database_version(classifier_path)
+    return f"{database_version(db_path)}:{classifier}:{source_version(EXTRACTION_SOURCES)}"
+
+
+def content_key(*parts: Any) -> str:
+    """Clé adressée par contenu à partir des paramètres d'une extraction"""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        if self.max_size <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SQLiteCache:
+    def __init__(self, path: Path, version: str, max_entries: int = 50000):
+        """
+        Args:
+            path: Fichier SQLite (créé si absent)
+            version: Version des résultats (extraction_version) ; les entrées
+                     d'autres versions sont purgées
+            max_entries: Nombre maximum d'entrées (éviction des moins récemment lues)
+        """
+        self.path = Path(path)
+        self.version = version
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache ("
+            " version TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (version, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS extraction_cache_access"
+            " ON extraction_cache (last_access)"
+        )
+        self._conn.execute("DELETE FROM extraction_cache WHERE version != ?", (version,))
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn.execute(
+            "SELECT value FROM extraction_cache WHERE version = ? AND key = ?",
+            (self.version, key)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE extraction_cache SET last_access = ?, hits = hits + 1"
+            " WHERE version = ? AND key = ?",
+            (time.time(), self.version, key)
+        )
+        self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO extraction_cache (version, key, value, last_access)"
+            " VALUES (?, ?, ?, ?)",
+            (self.version, key, json.dumps(value, ensure_ascii=False), time.time())
+        )
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment lues au-delà de max_entries"""
+        count = self._conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        # Libérer 10 % de marge pour ne pas évincer à chaque insertion
+        excess += self.max_entries // 10
+        self._conn.execute(
+            "DELETE FROM extraction_cache WHERE rowid IN ("
+            " SELECT rowid FROM extraction_cache ORDER BY last_access LIMIT ?)",
+            (excess,)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques du cache (entrées, lectures, taille du fichier)"""
+        entries, hits = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM extraction_cache"
+        ).fetchone()
+        size = sum(
+            candidate.stat().st_size
+            for candidate in (self.path, Path(f"{self.path}-wal"))
+            if candidate.exists()
+        )
+        return {
+            "path": str(self.path),
+            "extraction_version": self.version,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "size_bytes": size,
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Démon d'extraction de métadonnées
+Charge la base, l'index et (si besoin) le modèle IA une seule fois,
+puis répond à des requêtes JSON délimitées par des retours à la ligne
+sur stdin/stdout ou sur une socket Unix
+
+Requête :  {"id": 1, "title": "...", "use_ai_fallback": true, "min_confidence": 0.9}
+Réponse :  {"id": 1, "metadata": {...}, "confidence": 0.95, "should_skip": false}
+Avec "top_k": 4, la réponse contient aussi "candidates" (voir extract_top_k)
+Erreur :   {"id": 1, "error": "..."}
+"""
+import json
+import os
+import socketserver
+import sys
+import threading
+from typing import Dict, TextIO
+
+from hybrid_extractor import HybridMotorcycleExtractor
+
+
+def handle_request(extractor: HybridMotorcycleExtractor, request: Dict,
+                   min_confidence: float) -> Dict:
+    """Traite une requête décodée et construit la réponse (avec le même id)"""
+    response = {"id": request.get("id")}
+    title = request.get("title")
+    if not isinstance(title, str) or not title:
+        response["error"] = "missing 'title'"
+        return response
+
+    threshold = float(request.get("min_confidence", min_confidence))
+    use_ai = bool(request.get("use_ai_fallback", True))
+    metadata, confidence = extractor.extract(title, use_ai_fallback=use_ai)
+
+    response.update({
+        "metadata": metadata,
+        "confidence": confidence,
+        "should_skip": metadata is None or confidence < threshold,
+    })
+
+    top_k = request.get("top_k")
+    if top_k:
+        response["candidates"] = extractor.extract_top_k(title, int(top_k))
+    return response
+
+
+def handle_line(extractor: HybridMotorcycleExtractor, line: str,
+                min_confidence: float) -> str:
+    """Décode une ligne, traite la requête et encode la réponse"""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+    except ValueError as e:
+        return json.dumps({"id": None, "error": f"invalid request: {e}"})
+
+    try:
+        response = handle_request(extractor, request, min_confidence)
+    except Exception as e:
+        response = {"id": request.get("id"), "error": str(e)}
+    return json.dumps(response, ensure_ascii=False)
+
+
+def serve_stdio(extractor: HybridMotorcycleExtractor, min_confidence: float,
+                stdin: TextIO = sys.stdin, stdout: TextIO = sys.stdout):
+    """Boucle requête/réponse sur stdin/stdout (une ligne JSON par message)"""
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        stdout.write(handle_line(extractor, line, min_confidence) + "\n")
+        stdout.flush()
+
+
+def serve_unix_socket(extractor: HybridMotorcycleExtractor, path: str,
+                      min_confidence: float):
+    """Même protocole sur une socket Unix, une connexion par thread"""
+    # L'extracteur (cache, modèle IA) n'est pas thread-safe : accès sérialisés
+    lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode('utf-8').strip()
+                if not line:
+                    continue
+                with lock:
+                    reply = handle_line(extractor, line, min_confidence)
+                self.wfile.write((reply + "\n").encode('utf-8'))
+                self.wfile.flush()
+
+    if os.path.exists(path):
+        os.unlink(path)
+
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.daemon_threads = True
+        print(f"🟢 Démon d'extraction à l'écoute sur {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+def run_daemon(min_confidence: float, socket_path: str = None):
+    """Point d'entrée : charge l'extracteur une fois puis sert les requêtes"""
+    # Le protocole utilise stdout : les logs (chargement du modèle...) vont sur stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    extractor = HybridMotorcycleExtractor(confidence_threshold=min_confidence, verbose=False)
+
+    if socket_path:
+        serve_unix_socket(extractor, socket_path, min_confidence)
+    else:
+        serve_stdio(extractor, min_confidence, stdout=protocol_out)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Microservice HTTP d'extraction de métadonnées (asyncio, sans dépendance)
+Plusieurs workers du backend partagent ainsi une seule base et un seul modèle
+
+Endpoints :
+    POST /extract        {"title": "...", "use_ai_fallback": true, "min_confidence": 0.9}
+    POST /extract/batch  {"titles": ["...", "..."], "use_ai_fallback": true}
+    GET  /health
+
+Nombre borné de titres en cours, IA comprise (503 au-delà, 413 pour un lot
+qui ne tiendrait jamais), délai maximal par requête (504) et micro-batching
+des fallbacks IA en un seul passage du modèle
+"""
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from extraction_cache import LRUCache
+from hybrid_extractor import HybridMotorcycleExtractor
+
+MAX_BODY_SIZE = 1024 * 1024
+
+_STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ExtractionService:
+    def __init__(self, extractor: HybridMotorcycleExtractor, min_confidence: float = 0.90,
+                 queue_size: int = 256, request_timeout: float = 30.0,
+                 ai_batch_size: int = 8, ai_batch_wait: float = 0.02):
+        """
+        Args:
+            extractor: Extracteur partagé par toutes les requêtes
+            min_confidence: Seuil par défaut pour should_skip
+            queue_size: Nombre maximum de titres en cours, en file ou en attente
+                        du modèle IA (au-delà : 503 ; lot plus grand : 413), au moins 1
+            request_timeout: Délai maximal d'une requête en secondes (au-delà : 504)
+            ai_batch_size: Nombre maximum de titres par passage du modèle IA
+            ai_batch_wait: Attente maximale pour compléter un lot IA (secondes)
+        """
+        # asyncio.Queue(0) serait illimitée, et la vérification de capacité refuserait tout
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be at least 1, got {queue_size}")
+        self.extractor = extractor
+        self.min_confidence = min_confidence
+        self.request_timeout = request_timeout
+        self.ai_batch_size = ai_batch_size
+        self.ai_batch_wait = ai_batch_wait
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._ai_queue: asyncio.Queue = asyncio.Queue()
+        # Titres acceptés et pas encore résolus (libérés à la fin de leur future)
+        self._in_flight = 0
+        self._ai_cache = LRUCache(1024)
+        # Le modèle tourne dans un thread dédié pour ne pas bloquer la boucle
+        self._ai_executor = ThreadPoolExecutor(max_workers=1)
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._match_worker()),
+            asyncio.create_task(self._ai_worker()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._ai_executor.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "ai_pending": self._ai_queue.qsize(),
+            "in_flight": self._in_flight,
+        }
+
+    async def submit_many(self, titles: List[str], use_ai_fallback: bool,
+                          min_confidence: float) -> List[Dict]:
+        """Met les titres en file et attend leurs résultats (dans l'ordre)"""
+        # Lot plus grand que la file : réessayer ne servirait à rien (pas un 503)
+        if len(titles) > self._queue.maxsize:
+            raise HTTPError(413, f"batch of {len(titles)} titles exceeds the queue size "
+                                 f"({self._queue.maxsize}); split it")
+        if self._queue.maxsize - self._in_flight < len(titles):
+            raise HTTPError(503, "extraction queue is full")
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for title in titles:
+            future = loop.create_future()
+            # Résultat, erreur ou annulation (504) : le titre ne compte plus
+            future.add_done_callback(self._release)
+            self._in_flight += 1
+            self._queue.put_nowait((title, use_ai_fallback, future))
+            futures.append(future)
+
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*futures), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, f"extraction timed out after {self.request_timeout:.1f}s")
+
+        return [
+            {
+                "metadata": metadata,
+                "confidence": confidence,
+                "should_skip": metadata is None or confidence < min_confidence,
+            }
+            for metadata, confidence in results
+        ]
+
+    def _release(self, future: asyncio.Future):
+        self._in_flight -= 1
+
+    async def _match_worker(self):
+        """Matching sur la base (rapide, dans la boucle) ; les échecs vont au lot IA"""
+        while True:
+            title, use_ai, future = await self._queue.get()
+            if future.done():
+                # Requête expirée entre-temps
+                continue
+            try:
+                result = self.extractor.extract(title, use_ai_fallback=False)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+
+            if result[0] is None and use_ai:
+                cached = self._ai_cache.get(title)
+                if cached is not None:
+                    future.set_result(cached)
+                else:
+                    self._ai_queue.put_nowait((title, future))
+            else:
+                future.set_result(result)
+
+    async def _ai_worker(self):
+        """Regroupe les fallbacks IA arrivés ensemble en un seul passage du modèle"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._ai_queue.get()]
+            deadline = loop.time() + self.ai_batch_wait
+            while len(batch) < self.ai_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._ai_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(title, future) for title, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            titles = [title for title, _ in batch]
+            try:
+                # Brouillons lus dans la boucle, comme le rechargement de l'index :
+                # le thread du modèle ne touche pas à l'index
+                drafts = [self.extractor.ai_drafts(title) for title in titles]
+                results = await loop.run_in_executor(
+                    self._ai_executor, self.extractor.ai_fallback_many, titles, drafts
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (title, future), result in zip(batch, results):
+                if result[0] is not None:
+                    self._ai_cache.put(title, result)
+                if not future.done():
+                    future.set_result(result)
+
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        """Route une requête HTTP décodée vers la bonne action"""
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", **self.stats()}
+
+        if method != "POST" or path not in ("/extract", "/extract/batch"):
+            raise HTTPError(404, f"no route for {method} {path}")
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HTTPError(400, f"invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "request body must be a JSON object")
+
+        use_ai = bool(payload.get("use_ai_fallback", True))
+        threshold = float(payload.get("min_confidence", self.min_confidence))
+
+        if path == "/extract":
+            title = payload.get("title")
+            if not isinstance(title, str) or not title:
+                raise HTTPError(400, "missing 'title'")
+            results = await self.submit_many([title], use_ai, threshold)
+            return 200, results[0]
+
+        titles = payload.get("titles")
+        if not isinstance(titles, list) or not all(isinstance(t, str) and t for t in titles):
+            raise HTTPError(400, "'titles' must be a list of non-empty strings")
+        return 200, {"results": await self.submit_many(titles, use_ai, threshold)}
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict, bytes]]:
+    """Lit une requête HTTP/1.1 (ligne de requête, en-têtes, corps) ; None si fermée"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split('?', 1)[0], headers, body
+
+
+def _encode_response(status: int, payload: Dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (
+        f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+async def serve_http(extractor: HybridMotorcycleExtractor, host: str, port: int,
+                     min_confidence: float = 0.90, **service_options):
+    """Démarre le serveur HTTP et sert jusqu'à interruption"""
+    service = ExtractionService(extractor, min_confidence, **service_options)
+    service.start()
+
+    async def on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await service.handle(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    status, payload = 400, {"error": str(e)}
+
+                writer.write(_encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_connection, host, port)
+    print(f"🟢 Serveur d'extraction HTTP sur http://{host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def run_http_server(min_confidence: float, host: str, port: int, **service_options):
+    """Point d'entrée : charge l'extracteur une fois puis sert les requêtes HTTP"""
+    extractor = HybridMotorcycleExtractor(confidence_threshold=min_confidence, verbose=False)
+    try:
+        asyncio.run(serve_http(extractor, host, port, min_confidence, **service_options))
+    except KeyboardInterrupt:
+        pass
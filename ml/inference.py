@@ -3,18 +3,125 @@
 Script d'inférence pour extraire les métadonnées de motos
 depuis un titre/description YouTube
 """
+import argparse
+import os
+import platform
+import time
 import torch
 import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
 from peft import PeftModel
 
+from constrained_generation import (
+    PROMPT_PREFIX, ConstrainedExtractor, anchored_token_texts, generate_constrained,
+    generate_constrained_batch
+)
+from constrained_json import ConstrainedDecoder, JsonObjectGrammar, load_field_vocabularies
+
 MODEL_DIR = "models/moto-metadata-extractor"
+BASE_MODEL = "microsoft/Phi-3-mini-4k-instruct"
+# Base + adaptateurs LoRA fusionnés en un seul fichier (voir export_merged_model.py)
+MERGED_DIR = "models/moto-metadata-extractor-merged"
+MERGED_WEIGHTS = "model.safetensors"
+
+# Backend par défaut : "cuda" (4 bits via bitsandbytes), "cpu" (LoRA fusionné,
+# int8 dynamique) ou "auto" (GPU s'il y en a un)
+DEVICE_ENV = "MOTO_AI_DEVICE"
+# Nombre de threads PyTorch sur CPU (défaut : celui de PyTorch)
+THREADS_ENV = "MOTO_AI_THREADS"
+
+
+def resolve_device(device: Optional[str] = None) -> str:
+    """Backend demandé (argument, sinon MOTO_AI_DEVICE, sinon auto)"""
+    device = (device or os.environ.get(DEVICE_ENV) or "auto").lower()
+    if device == "auto":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    if device not in ("cpu", "cuda"):
+        raise ValueError(f"Backend inconnu: {device} (cpu, cuda ou auto)")
+    return device
+
+
+def merged_checkpoint(model_path=MODEL_DIR, merged_path=MERGED_DIR) -> Optional[Path]:
+    """Dossier du checkpoint fusionné s'il existe et n'est pas plus ancien que les adaptateurs"""
+    weights = Path(merged_path) / MERGED_WEIGHTS
+    if not weights.exists():
+        return None
+
+    adapters = [Path(model_path) / name for name in ("adapter_model.safetensors", "adapter_model.bin")]
+    if any(adapter.exists() and adapter.stat().st_mtime > weights.stat().st_mtime for adapter in adapters):
+        print(f"⚠️  {weights} est plus ancien que les adaptateurs : ignoré (relancer export_merged_model.py)")
+        return None
+    return Path(merged_path)
+
+
+def export_merged(model_path=MODEL_DIR, merged_path=MERGED_DIR,
+                  dtype: torch.dtype = torch.bfloat16) -> Path:
+    """
+    Fusionne les adaptateurs LoRA dans la base et sauvegarde le tout en un seul
+    fichier safetensors (projeté en mémoire au chargement, sans PEFT)
+
+    Returns:
+        Chemin du fichier de poids
+    """
+    base_model = AutoModelForCausalLM.from_pretrained(
+        BASE_MODEL,
+        trust_remote_code=True,
+        torch_dtype=dtype,
+        low_cpu_mem_usage=True
+    )
+    model = PeftModel.from_pretrained(base_model, model_path).merge_and_unload()
+
+    # Un seul fichier : pas de découpage en morceaux
+    model.save_pretrained(merged_path, safe_serialization=True, max_shard_size="100GB")
+    AutoTokenizer.from_pretrained(model_path, trust_remote_code=True).save_pretrained(merged_path)
+    return Path(merged_path) / MERGED_WEIGHTS
+
+
+class MotoMetadataExtractor(ConstrainedExtractor):
+    def __init__(self, model_path=MODEL_DIR, device: Optional[str] = None,
+                 threads: Optional[int] = None, merged_path=MERGED_DIR):
+        """
+        Initialise le modèle
+
+        Args:
+            model_path: Dossier des adaptateurs LoRA et du tokenizer
+            device: "cpu", "cuda" ou "auto" (défaut : MOTO_AI_DEVICE, sinon auto)
+            threads: Threads PyTorch sur CPU (défaut : MOTO_AI_THREADS)
+            merged_path: Checkpoint fusionné, utilisé à la place de base + LoRA s'il existe
+        """
+        self.device = resolve_device(device)
+
+        # Checkpoint fusionné : chargé directement, sans couches LoRA
+        merged = merged_checkpoint(model_path, merged_path)
+        weights_path = str(merged) if merged else BASE_MODEL
+        adapter_path = None if merged else model_path
+        print(f"📥 Chargement du modèle depuis {merged or model_path} ({self.device})...")
+
+        # Charger tokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+
+        if self.device == "cpu":
+            self.model = self._load_cpu_model(weights_path, adapter_path, threads)
+        else:
+            self.model = self._load_cuda_model(weights_path, adapter_path)
+        self.model.eval()
+
+        # Sortie contrainte au squelette JSON, valeurs tirées de la base
+        self.grammar = JsonObjectGrammar(load_field_vocabularies())
+        self.decoder = ConstrainedDecoder(self._token_texts(), self.grammar)
 
-class MotoMetadataExtractor:
-    def __init__(self, model_path=MODEL_DIR):
-        """Initialise le modèle"""
-        print(f"📥 Chargement du modèle depuis {model_path}...")
+        # Cache KV du début commun des prompts, réutilisé à chaque appel
+        self._prefix_ids, self._prefix_kv = self._compute_prefix_cache()
 
+        # Passages du modèle pendant la génération (mesure du décodage spéculatif)
+        self.forward_passes = 0
+
+        print("✅ Modèle chargé et prêt !")
+
+    def _load_cuda_model(self, weights_path: str, adapter_path: Optional[str]):
+        """Poids quantifiés en 4 bits (bitsandbytes) + adaptateurs LoRA s'ils ne sont pas fusionnés"""
         # Configuration quantization
         bnb_config = BitsAndBytesConfig(
             load_in_4bit=True,
@@ -23,60 +130,170 @@ class MotoMetadataExtractor:
             bnb_4bit_compute_dtype=torch.bfloat16
         )
 
-        # Charger tokenizer
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
-
         # Charger modèle de base
         base_model = AutoModelForCausalLM.from_pretrained(
-            "microsoft/Phi-3-mini-4k-instruct",
+            weights_path,
             quantization_config=bnb_config,
             device_map="auto",
             trust_remote_code=True,
             torch_dtype=torch.bfloat16
         )
+        if adapter_path is None:
+            return base_model
 
         # Charger adaptateurs LoRA
-        self.model = PeftModel.from_pretrained(base_model, model_path)
-        self.model.eval()
+        return PeftModel.from_pretrained(base_model, adapter_path)
 
-        print("✅ Modèle chargé et prêt !")
+    def _load_cpu_model(self, weights_path: str, adapter_path: Optional[str], threads: Optional[int]):
+        """
+        Poids en float32 avec les adaptateurs LoRA fusionnés (à la volée si le
+        checkpoint n'est pas déjà fusionné), puis couches linéaires quantifiées
+        en int8 dynamique (sans GPU ni bitsandbytes)
+        """
+        threads = threads or int(os.environ.get(THREADS_ENV) or 0)
+        if threads:
+            torch.set_num_threads(threads)
+
+        model = AutoModelForCausalLM.from_pretrained(
+            weights_path,
+            trust_remote_code=True,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True
+        )
+
+        # Fusion des adaptateurs : plus de couches LoRA à chaque passage
+        if adapter_path is not None:
+            model = PeftModel.from_pretrained(model, adapter_path).merge_and_unload()
 
-    def extract(self, title, channel="Unknown"):
-        """Extrait les métadonnées depuis un titre YouTube"""
-        prompt = f"<|user|>\nTitle: {title}\nExtract motorcycle metadata:<|end|>\n<|assistant|>\n"
+        # Poids int8, activations quantifiées à la volée. En place : sans cela, le
+        # modèle float32 entier (15 Go) est d'abord copié
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8,
+                                                      inplace=True)
 
-        # Tokenizer
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+    def _token_texts(self) -> List[str]:
+        """Texte de chaque token tel qu'il apparaît en cours de génération (vide si spécial)"""
+        # Décodé après un token d'ancrage : sentencepiece garde ainsi l'espace initial
+        anchor = self.tokenizer.encode("a", add_special_tokens=False)
+        anchor_text = self.tokenizer.decode(anchor)
+        decoded = self.tokenizer.batch_decode(
+            [anchor + [token_id] for token_id in range(len(self.tokenizer))],
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=False
+        )
+        return anchored_token_texts(decoded, anchor_text)
+
+    def _encode(self, text: str) -> List[int]:
+        return self.tokenizer(text).input_ids
 
-        # Générer
+    def _compute_prefix_cache(self):
+        """Passe le début commun des prompts dans le modèle une fois pour toutes"""
+        prefix_ids = self.tokenizer(PROMPT_PREFIX).input_ids
         with torch.no_grad():
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=150,
-                temperature=0.1,
-                do_sample=False,
-                pad_token_id=self.tokenizer.eos_token_id
+            outputs = self.model(
+                input_ids=torch.tensor([prefix_ids], device=self.model.device),
+                use_cache=True
             )
+        past = outputs.past_key_values
+        # Format tuple (clés, valeurs) par couche : copiable quelle que soit la version
+        if hasattr(past, "to_legacy_cache"):
+            past = past.to_legacy_cache()
+        return prefix_ids, past
 
-        # Décoder
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-        # Extraire le JSON
+    def _prefix_past(self, batch_size: int = 1):
+        """
+        Copie du cache du préfixe pour un lot (le modèle étend le cache en place,
+        l'original doit rester intact)
+        """
+        legacy = tuple(
+            (keys.expand(batch_size, -1, -1, -1).contiguous(),
+             values.expand(batch_size, -1, -1, -1).contiguous())
+            for keys, values in self._prefix_kv
+        )
         try:
-            # Le modèle retourne le prompt + la réponse, on prend après "assistant"
-            json_start = response.find("{")
-            json_end = response.rfind("}") + 1
-            json_str = response[json_start:json_end]
-            metadata = json.loads(json_str)
-            return metadata
-        except Exception as e:
-            print(f"❌ Erreur parsing JSON: {e}")
-            print(f"   Réponse brute: {response}")
-            return None
-
-def test_extractor():
+            from transformers import DynamicCache
+        except ImportError:
+            return legacy
+        return DynamicCache.from_legacy_cache(legacy)
+
+    def _crop_past(self, past_key_values, length: int):
+        """Cache KV ramené à ses length premières positions (tokens rejetés)"""
+        if hasattr(past_key_values, "crop"):
+            past_key_values.crop(length)
+            return past_key_values
+        return tuple((keys[:, :, :length], values[:, :, :length]) for keys, values in past_key_values)
+
+    def _generate_constrained(self, input_ids: List[int],
+                              drafts: Sequence[str] = ()) -> Tuple[Optional[str], Dict[str, float]]:
+        """Décodage contraint (et spéculatif) d'un prompt : voir constrained_generation"""
+        pending = list(input_ids)
+        past_key_values = None
+        cache_length = 0
+        if self._has_prefix(input_ids):
+            # Seuls le titre et la fin du prompt restent à calculer
+            pending = pending[len(self._prefix_ids):]
+            past_key_values = self._prefix_past()
+            cache_length = len(self._prefix_ids)
+
+        def forward(token_ids: List[int], positions: int):
+            nonlocal past_key_values, cache_length
+            outputs = self.model(
+                input_ids=torch.tensor([token_ids], device=self.model.device),
+                past_key_values=past_key_values,
+                use_cache=True
+            )
+            self.forward_passes += 1
+            past_key_values = outputs.past_key_values
+            cache_length += len(token_ids)
+            return outputs.logits[0, -positions:].float().cpu().numpy()
+
+        def crop(count: int):
+            nonlocal past_key_values, cache_length
+            cache_length -= count
+            past_key_values = self._crop_past(past_key_values, cache_length)
+
+        with torch.no_grad():
+            return generate_constrained(self.grammar, self.decoder, forward, crop, pending, drafts)
+
+    def _generate_constrained_batch(self, batch_ids: List[List[int]]) -> List[Tuple[Optional[str], Dict[str, float]]]:
+        """Décodage contraint de plusieurs prompts à la fois : voir constrained_generation"""
+        if len(batch_ids) == 1:
+            return [self._generate_constrained(batch_ids[0])]
+
+        device = self.model.device
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = self.tokenizer.eos_token_id
+
+        past_key_values = None
+        prefix_length = 0
+        if all(self._has_prefix(ids) for ids in batch_ids):
+            # Préfixe en cache, puis padding masqué, puis la partie propre à chaque titre
+            past_key_values = self._prefix_past(len(batch_ids))
+            prefix_length = len(self._prefix_ids)
+            batch_ids = [ids[prefix_length:] for ids in batch_ids]
+
+        def forward(input_ids, attention_mask, position_ids):
+            nonlocal past_key_values
+            outputs = self.model(
+                input_ids=torch.from_numpy(input_ids).to(device),
+                attention_mask=torch.from_numpy(attention_mask).to(device),
+                position_ids=torch.from_numpy(position_ids).to(device),
+                past_key_values=past_key_values,
+                use_cache=True
+            )
+            self.forward_passes += 1
+            past_key_values = outputs.past_key_values
+            return outputs.logits[:, -1].float().cpu().numpy()
+
+        with torch.no_grad():
+            return generate_constrained_batch(
+                self.grammar, self.decoder, forward, batch_ids, pad_id, prefix_length
+            )
+
+
+def test_extractor(device: Optional[str] = None, threads: Optional[int] = None):
     """Test le modèle sur quelques exemples"""
-    extractor = MotoMetadataExtractor()
+    extractor = MotoMetadataExtractor(device=device, threads=threads)
 
     test_cases = [
         "Ducati Panigale V4S Sound!",
@@ -95,5 +312,91 @@ def test_extractor():
             print(f"   ❌ Échec de l'extraction")
         print()
 
+
+def host_description() -> str:
+    """Modèle de CPU de l'hôte, pour consigner un débit mesuré"""
+    try:
+        with open("/proc/cpuinfo", 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def benchmark(device: Optional[str] = None, threads: Optional[int] = None,
+              batch_size: int = 8, dataset: str = "data/val.jsonl", limit: int = 32,
+              speculative: bool = False) -> float:
+    """
+    Mesure le débit de génération (tokens de sortie par seconde) sur des
+    titres du jeu de validation
+
+    Avec speculative, les brouillons viennent des candidats de l'extracteur
+    hybride (utilisés avec batch_size=1) ; les réponses sont comparées à
+    celles du décodage normal
+
+    Returns:
+        Débit en tokens/s
+    """
+    extractor = MotoMetadataExtractor(device=device, threads=threads)
+
+    titles = []
+    with open(dataset, 'r', encoding='utf-8') as f:
+        for line in f:
+            prompt = json.loads(line)["input"]
+            titles.append(prompt.split('\n')[0][len("Title: "):])
+            if len(titles) >= limit:
+                break
+
+    drafts = None
+    if speculative:
+        from hybrid_extractor import HybridMotorcycleExtractor
+        hybrid = HybridMotorcycleExtractor(verbose=False)
+        drafts = [hybrid.ai_drafts(title) for title in titles]
+        reference = extractor.extract_batch(titles, batch_size)
+
+    # Échauffement (allocation, noyaux) hors mesure
+    extractor.extract(titles[0])
+
+    extractor.forward_passes = 0
+    start = time.perf_counter()
+    results = [metadata for metadata, _ in extractor.extract_batch_scored(titles, batch_size, drafts)]
+    elapsed = time.perf_counter() - start
+
+    tokens = sum(
+        len(extractor.tokenizer(json.dumps(metadata, ensure_ascii=False), add_special_tokens=False).input_ids)
+        for metadata in results if metadata
+    )
+    rate = tokens / elapsed
+    threads_info = f", {torch.get_num_threads()} threads" if extractor.device == "cpu" else ""
+    print(f"⚡ {len(titles)} titres, {tokens} tokens en {elapsed:.1f}s → {rate:.1f} tokens/s "
+          f"({extractor.device}{threads_info}, lots de {batch_size})")
+    print(f"   {elapsed / len(titles) * 1000:.0f} ms par titre, "
+          f"{extractor.forward_passes / len(titles):.1f} passages du modèle par titre")
+    if speculative:
+        same = sum(a == b for a, b in zip(results, reference))
+        print(f"   Décodage spéculatif : {same}/{len(titles)} réponses identiques au décodage normal")
+    elif extractor.device == "cpu":
+        # Ligne du tableau des débits CPU de ML_TRAINING_STATUS.md
+        print(f"   | {host_description()}, {torch.get_num_threads()} threads | `cpu` (int8 dynamique) "
+              f"| {batch_size} | {rate:.1f} tokens/s | {elapsed / len(titles) * 1000:.0f} ms |")
+    return rate
+
+
 if __name__ == "__main__":
-    test_extractor()
+    parser = argparse.ArgumentParser(description='Moto metadata model inference')
+    parser.add_argument('--device', choices=['auto', 'cpu', 'cuda'],
+                        help=f'Inference backend (default: ${DEVICE_ENV} or auto)')
+    parser.add_argument('--threads', type=int, help=f'CPU threads (default: ${THREADS_ENV})')
+    parser.add_argument('--benchmark', action='store_true', help='Measure generation tokens/s')
+    parser.add_argument('--batch-size', type=int, default=8, help='With --benchmark, titles per batch')
+    parser.add_argument('--speculative', action='store_true',
+                        help='With --benchmark, draft from the database candidates and verify in one pass '
+                             '(titles decoded alone: use with --batch-size 1)')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.device, args.threads, args.batch_size, speculative=args.speculative)
+    else:
+        test_extractor(args.device, args.threads)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Générateur de charge pour le serveur HTTP d'extraction
+Envoie des titres du jeu de validation en parallèle et affiche p50/p99
+
+Usage: python3 load_test.py --url http://127.0.0.1:8765 --requests 2000 --concurrency 16
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+DATA_PATH = Path(__file__).parent / "data" / "val.jsonl"
+
+
+def load_titles():
+    """Titres du jeu de validation (format d'entraînement "Title: ...")"""
+    titles = []
+    with open(DATA_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            prompt = json.loads(line)['input']
+            titles.append(prompt.split('\n')[0].replace('Title: ', '', 1))
+    return titles
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the extraction HTTP API')
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help='Server base URL')
+    parser.add_argument('--requests', type=int, default=2000, help='Total number of requests')
+    parser.add_argument('--concurrency', type=int, default=16, help='Parallel connections')
+    parser.add_argument('--batch', type=int, default=1, help='Titles per request (uses /extract/batch if > 1)')
+    parser.add_argument('--no-ai-fallback', action='store_true', help='Disable AI fallback')
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    titles = load_titles()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker():
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+
+            if args.batch > 1:
+                path = "/extract/batch"
+                chunk = [titles[(i * args.batch + k) % len(titles)] for k in range(args.batch)]
+                payload = {"titles": chunk}
+            else:
+                path = "/extract"
+                payload = {"title": titles[i % len(titles)]}
+            payload["use_ai_fallback"] = not args.no_ai_fallback
+            body = json.dumps(payload)
+
+            start = time.perf_counter()
+            conn.request("POST", path, body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+        conn.close()
+
+    print(f"🚀 {args.requests} requêtes, {args.concurrency} connexions, lot de {args.batch}")
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    print(f"   Statuts : {statuses}")
+    print(f"   Débit   : {len(latencies) / duration:.0f} req/s")
+    print(f"   p50     : {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"   p99     : {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"   moyenne : {statistics.mean(latencies) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Index inversé de trigrammes de caractères
+Produit une courte liste de candidats par titre pour que la similarité
+coûteuse (SequenceMatcher) ne tourne que sur quelques noms de la base
+"""
+from collections import Counter
+from typing import Any, Dict, List, Set, Tuple
+
+NGRAM_SIZE = 3
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    """Trigrammes d'un texte normalisé (bordé d'espaces pour les noms courts)"""
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NgramIndex:
+    def __init__(self, n: int = NGRAM_SIZE):
+        self.n = n
+        # Trigramme → identifiants des noms qui le contiennent
+        self._postings: Dict[str, List[int]] = {}
+        self._names: List[str] = []
+        self._values: List[Any] = []
+        self._sizes: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, name: str, value: Any):
+        """Indexe un nom normalisé associé à une valeur"""
+        name_id = len(self._names)
+        grams = char_ngrams(name, self.n)
+        self._names.append(name)
+        self._values.append(value)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(name_id)
+
+    def candidates(self, text: str, min_overlap: float = 0.4,
+                   limit: int = 10) -> List[Tuple[str, Any, float]]:
+        """
+        Noms partageant assez de trigrammes avec le texte
+
+        Args:
+            text: Texte normalisé (titre)
+            min_overlap: Part minimale des trigrammes du nom présents dans le texte
+            limit: Nombre maximum de candidats retournés
+
+        Returns:
+            Liste de (nom, valeur, recouvrement), meilleurs recouvrements d'abord
+        """
+        counts = Counter()
+        for gram in char_ngrams(text, self.n):
+            for name_id in self._postings.get(gram, ()):
+                counts[name_id] += 1
+
+        scored = []
+        for name_id, shared in counts.items():
+            overlap = shared / self._sizes[name_id]
+            if overlap >= min_overlap:
+                scored.append((overlap, -name_id))
+        scored.sort(reverse=True)
+
+        return [
+            (self._names[-neg_id], self._values[-neg_id], overlap)
+            for overlap, neg_id in scored[:limit]
+        ]
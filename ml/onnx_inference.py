@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Inférence du modèle de métadonnées exporté en ONNX (voir export_onnx.py)
+
+Même interface qu'inference.MotoMetadataExtractor, sans torch, transformers
+ni bitsandbytes : onnxruntime (CPU, poids int8), tokenizers et NumPy suffisent.
+Le graphe prend et rend le cache KV : un passage par token généré.
+Décodage (lots, brouillons spéculatifs) partagé avec inference.py :
+voir constrained_generation.py
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+
+from constrained_generation import (
+    PROMPT_PREFIX, ConstrainedExtractor, anchored_token_texts, generate_constrained,
+    generate_constrained_batch
+)
+from constrained_json import ConstrainedDecoder, JsonObjectGrammar, load_field_vocabularies
+
+ONNX_DIR = "models/moto-metadata-extractor-onnx"
+ONNX_MODEL = "model.int8.onnx"
+# Dimensions du cache KV et noms des entrées/sorties, écrits par export_onnx.py
+ONNX_CONFIG = "onnx_config.json"
+
+# Nombre de threads onnxruntime (défaut : celui d'onnxruntime)
+THREADS_ENV = "MOTO_AI_THREADS"
+
+
+class OnnxMotoMetadataExtractor(ConstrainedExtractor):
+    def __init__(self, model_dir=ONNX_DIR, threads: Optional[int] = None):
+        """
+        Initialise la session onnxruntime
+
+        Args:
+            model_dir: Dossier produit par export_onnx.py (graphe, config, tokenizer)
+            threads: Threads onnxruntime (défaut : MOTO_AI_THREADS)
+        """
+        model_dir = Path(model_dir)
+        print(f"📥 Chargement du modèle ONNX depuis {model_dir}...")
+
+        with open(model_dir / ONNX_CONFIG, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        options = ort.SessionOptions()
+        threads = threads or int(os.environ.get(THREADS_ENV) or 0)
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_dir / ONNX_MODEL), options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+
+        # Sortie contrainte au squelette JSON, valeurs tirées de la base
+        self.grammar = JsonObjectGrammar(load_field_vocabularies())
+        self.decoder = ConstrainedDecoder(self._token_texts(), self.grammar)
+
+        # Passages du modèle pendant la génération (mesure du décodage spéculatif)
+        self.forward_passes = 0
+
+        # Cache KV du début commun des prompts, réutilisé à chaque appel
+        # (onnxruntime rend un nouveau cache : celui du préfixe reste intact)
+        self._prefix_ids = self._encode(PROMPT_PREFIX)
+        size = len(self._prefix_ids)
+        _, self._prefix_kv = self._forward(
+            np.array([self._prefix_ids], dtype=np.int64), np.ones((1, size), dtype=np.int64),
+            np.arange(size, dtype=np.int64)[None, :], self._empty_past()
+        )
+
+        print("✅ Modèle chargé et prêt !")
+
+    def _token_texts(self) -> List[str]:
+        """Texte de chaque token tel qu'il apparaît en cours de génération (vide si spécial)"""
+        # Décodé après un token d'ancrage : le décodeur garde ainsi l'espace initial
+        anchor = self.tokenizer.encode("a", add_special_tokens=False).ids
+        anchor_text = self.tokenizer.decode(anchor)
+        decoded = self.tokenizer.decode_batch(
+            [anchor + [token_id] for token_id in range(self.tokenizer.get_vocab_size())],
+            skip_special_tokens=True
+        )
+        return anchored_token_texts(decoded, anchor_text)
+
+    def _encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text).ids
+
+    def _empty_past(self, batch_size: int = 1) -> List[np.ndarray]:
+        """Cache KV vide (clés puis valeurs de chaque couche)"""
+        shape = (batch_size, self.config["num_kv_heads"], 0, self.config["head_dim"])
+        return [np.zeros(shape, dtype=np.float32) for _ in self.config["past_names"]]
+
+    def _prefix_past(self, batch_size: int = 1) -> List[np.ndarray]:
+        """Cache du préfixe répété pour chaque séquence du lot"""
+        if batch_size == 1:
+            return self._prefix_kv
+        return [np.repeat(tensor, batch_size, axis=0) for tensor in self._prefix_kv]
+
+    def _forward(self, input_ids: np.ndarray, attention_mask: np.ndarray,
+                 position_ids: np.ndarray, past: List[np.ndarray]):
+        """Un passage du graphe : logits de chaque position et cache KV étendu"""
+        feeds = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "position_ids": position_ids,
+        }
+        feeds.update(zip(self.config["past_names"], past))
+        logits, *present = self.session.run(None, feeds)
+        self.forward_passes += 1
+        return logits, present
+
+    def _generate_constrained(self, input_ids: List[int],
+                              drafts: Sequence[str] = ()) -> Tuple[Optional[str], Dict[str, float]]:
+        """Décodage contraint (et spéculatif) d'un prompt : voir constrained_generation"""
+        pending = list(input_ids)
+        past = self._empty_past()
+        if self._has_prefix(input_ids):
+            # Seuls le titre et la fin du prompt restent à calculer
+            pending = pending[len(self._prefix_ids):]
+            past = self._prefix_past()
+
+        def forward(token_ids: List[int], positions: int) -> np.ndarray:
+            nonlocal past
+            past_length = past[0].shape[2]
+            total = past_length + len(token_ids)
+            logits, past = self._forward(
+                np.array([token_ids], dtype=np.int64),
+                np.ones((1, total), dtype=np.int64),
+                np.arange(past_length, total, dtype=np.int64)[None, :],
+                past
+            )
+            return logits[0, -positions:]
+
+        def crop(count: int):
+            nonlocal past
+            length = past[0].shape[2] - count
+            past = [tensor[:, :, :length] for tensor in past]
+
+        return generate_constrained(self.grammar, self.decoder, forward, crop, pending, drafts)
+
+    def _generate_constrained_batch(self, batch_ids: List[List[int]]) -> List[Tuple[Optional[str], Dict[str, float]]]:
+        """Décodage contraint de plusieurs prompts à la fois : voir constrained_generation"""
+        if len(batch_ids) == 1:
+            return [self._generate_constrained(batch_ids[0])]
+
+        past = self._empty_past(len(batch_ids))
+        prefix_length = 0
+        if all(self._has_prefix(ids) for ids in batch_ids):
+            # Préfixe en cache, puis padding masqué, puis la partie propre à chaque titre
+            past = self._prefix_past(len(batch_ids))
+            prefix_length = len(self._prefix_ids)
+            batch_ids = [ids[prefix_length:] for ids in batch_ids]
+
+        def forward(input_ids: np.ndarray, attention_mask: np.ndarray, position_ids: np.ndarray) -> np.ndarray:
+            nonlocal past
+            logits, past = self._forward(input_ids, attention_mask, np.ascontiguousarray(position_ids), past)
+            return logits[:, -1]
+
+        # Padding masqué : n'importe quel token convient aux exports sans pad_token_id
+        pad_id = self.config.get("pad_token_id") or 0
+        return generate_constrained_batch(
+            self.grammar, self.decoder, forward, batch_ids, pad_id, prefix_length
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Moto metadata model inference (ONNX Runtime, CPU)')
+    parser.add_argument('--model-dir', default=ONNX_DIR, help='Directory written by export_onnx.py')
+    parser.add_argument('--threads', type=int, help=f'CPU threads (default: ${THREADS_ENV})')
+    parser.add_argument('titles', nargs='*', default=[
+        "Ducati Panigale V4S Sound!",
+        "2020 Kawasaki Ninja H2R Exhaust",
+        "Yamaha MT-09 Sound Test",
+        "BMW S1000RR Engine Sound"
+    ])
+    args = parser.parse_args()
+
+    extractor = OnnxMotoMetadataExtractor(args.model_dir, args.threads)
+    print("\n🧪 Test d'extraction:\n")
+    for title in args.titles:
+        print(f"📹 Titre: {title}")
+        metadata = extractor.extract(title)
+        if metadata:
+            print(f"   ✅ Résultat: {json.dumps(metadata, indent=2, ensure_ascii=False)}")
+        else:
+            print(f"   ❌ Échec de l'extraction")
+        print()
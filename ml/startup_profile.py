@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Profil du démarrage à froid des scripts d'extraction
+Mesure le temps de chaque import (inclusif et propre) et de chaque phase,
+et compare le total au budget de démarrage
+"""
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# Budget de démarrage à froid (hors interpréteur) quand le titre est résolu par la base
+COLD_START_BUDGET_MS = 60.0
+
+# Modules dont la présence signale un chargement de la pile ML
+HEAVY_MODULES = ("torch", "transformers", "peft", "bitsandbytes", "onnxruntime", "numpy", "scipy")
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (profondeur, module, temps inclusif, temps propre) en secondes
+        self.imports: List[Tuple[int, str, float, float]] = []
+        self.phases: List[Tuple[str, float]] = []
+        self._stack: List[List[float]] = []
+        self._original_import = None
+
+    def install(self):
+        """Remplace __import__ pour chronométrer les modules chargés pour la première fois"""
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        # [temps des imports enfants]
+        self._stack.append([0.0])
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()[0]
+            if self._stack:
+                self._stack[-1][0] += elapsed
+            self.imports.append((len(self._stack), name, elapsed, elapsed - children))
+
+    def elapsed(self) -> float:
+        """Secondes écoulées depuis la création du profileur"""
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, top: int = 12) -> str:
+        total_ms = self.elapsed() * 1000
+        lines = ["⏱️  Démarrage à froid (hors interpréteur)"]
+
+        lines.append("   Phases:")
+        for name, elapsed in self.phases:
+            lines.append(f"      {name:<28} {elapsed * 1000:8.2f} ms")
+
+        lines.append(f"   Imports les plus coûteux (temps propre, top {top}):")
+        for depth, name, inclusive, own in sorted(self.imports, key=lambda i: -i[3])[:top]:
+            lines.append(f"      {name:<28} {own * 1000:8.2f} ms  (inclusif {inclusive * 1000:.2f} ms)")
+
+        heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+        lines.append(f"   Pile ML chargée: {', '.join(heavy) if heavy else 'non'}")
+
+        status = "✅ dans le budget" if total_ms <= COLD_START_BUDGET_MS else "⚠️  hors budget"
+        lines.append(f"   Total: {total_ms:.2f} ms / budget {COLD_START_BUDGET_MS:.0f} ms → {status}")
+        return "\n".join(lines)
+
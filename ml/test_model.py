@@ -47,13 +47,24 @@ print("=" * 80)
 print("🧪 TEST DU MODÈLE - EXTRACTION DE MÉTADONNÉES INCOMPLÈTES")
 print("=" * 80)
 
+# Extraction de tous les titres en lots (un passage du modèle par token et par lot)
+try:
+    batch_results = extractor.extract_batch(test_cases)
+except Exception as e:
+    # Erreur sur un lot : chaque titre est extrait seul ci-dessous
+    print(f"⚠️  Extraction par lots impossible ({e}), extraction titre par titre")
+    batch_results = None
+
 results = []
 for i, title in enumerate(test_cases, 1):
     print(f"\n[Test {i}/{len(test_cases)}]")
     print(f"📹 Titre: \"{title}\"")
 
     try:
-        metadata_dict = extractor.extract(title)
+        if batch_results is not None:
+            metadata_dict = batch_results[i - 1]
+        else:
+            metadata_dict = extractor.extract(title)
 
         if metadata_dict is None:
             raise Exception("Extraction a retourné None")
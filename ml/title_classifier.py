@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Classifieur linéaire léger titre → entrée de motorcycle_database.json
+Distillé depuis l'extracteur hybride et le modèle Phi-3 (voir distill_classifier.py)
+
+Caractéristiques : mots et n-grammes de caractères du titre normalisé.
+Les poids sont creux (seuls les plus forts sont gardés) : une prédiction ne
+touche qu'une poignée de classes par caractéristique, en Python pur
+(ni torch ni NumPy à l'inférence)
+"""
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CLASSIFIER_FORMAT = 1
+
+# Emplacement par défaut (écrit par distill_classifier.py)
+CLASSIFIER_PATH = Path(__file__).parent / "models" / "title_classifier.json"
+
+# Tailles des n-grammes de caractères
+NGRAM_SIZES = (3, 4, 5)
+
+
+def title_features(title_norm: str) -> List[str]:
+    """Mots et n-grammes de caractères (bornés par des espaces) d'un titre normalisé"""
+    features = [f"w:{word}" for word in title_norm.split(' ') if word]
+    padded = f" {title_norm} "
+    for n in NGRAM_SIZES:
+        features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+
+class TitleClassifier:
+    def __init__(self, classes: List[Optional[int]], bias: List[float],
+                 weights: Dict[str, List[Sequence]], temperature: float = 1.0,
+                 db_version: Optional[str] = None):
+        """
+        Args:
+            classes: Position de l'entrée de la base pour chaque classe
+                     (None : titre sans moto reconnaissable)
+            bias: Biais par classe
+            weights: Caractéristique → [(classe, poids)] (creux, paires en listes une fois rechargé)
+            temperature: Température de calibration des probabilités
+            db_version: Version de la base sur laquelle les classes ont été apprises
+        """
+        self.classes = classes
+        self.bias = bias
+        self.weights = weights
+        self.temperature = temperature
+        self.db_version = db_version
+
+    @classmethod
+    def load(cls, path: Path) -> "TitleClassifier":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("format") != CLASSIFIER_FORMAT:
+            raise ValueError(f"format de classifieur non supporté: {data.get('format')}")
+        return cls(
+            data["classes"],
+            data["bias"],
+            data["weights"],
+            data["temperature"],
+            data.get("db_version"),
+        )
+
+    def save(self, path: Path):
+        data = {
+            "format": CLASSIFIER_FORMAT,
+            "db_version": self.db_version,
+            "temperature": self.temperature,
+            "classes": self.classes,
+            "bias": self.bias,
+            "weights": self.weights,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def logits(self, title_norm: str) -> List[float]:
+        """Scores bruts de chaque classe (une caractéristique répétée compte une fois)"""
+        scores = list(self.bias)
+        weights = self.weights
+        for feature in set(title_features(title_norm)):
+            for class_index, weight in weights.get(feature, ()):
+                scores[class_index] += weight
+        return scores
+
+    def probabilities(self, title_norm: str) -> List[float]:
+        """Probabilités calibrées (softmax à température) de chaque classe"""
+        scores = self.logits(title_norm)
+        top = max(scores)
+        exps = [math.exp((score - top) / self.temperature) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def predict(self, title_norm: str) -> Tuple[Optional[int], float]:
+        """
+        Returns:
+            (position de l'entrée ou None, probabilité calibrée)
+        """
+        probabilities = self.probabilities(title_norm)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.classes[best], probabilities[best]
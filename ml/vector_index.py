@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Index de trigrammes vectorisé (NumPy/SciPy)
+La base est encodée une fois en matrice creuse noms × trigrammes ;
+un titre est comparé à tous les noms en un seul produit matrice–vecteur,
+puis seuls les k meilleurs sont gardés
+"""
+from typing import Any, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from ngram_index import NgramIndex, char_ngrams
+
+
+class VectorNgramIndex(NgramIndex):
+    def __init__(self, n: int = 3):
+        super().__init__(n)
+        self._matrix = None
+        self._columns = {}
+        self._sizes_array = None
+
+    def add(self, name: str, value: Any):
+        super().add(name, value)
+        # La matrice sera reconstruite à la prochaine recherche
+        self._matrix = None
+
+    def _compile(self):
+        """Encode tous les noms en matrice creuse binaire (CSR)"""
+        self._columns = {gram: column for column, gram in enumerate(self._postings)}
+        rows, cols = [], []
+        for gram, name_ids in self._postings.items():
+            column = self._columns[gram]
+            rows.extend(name_ids)
+            cols.extend([column] * len(name_ids))
+
+        data = np.ones(len(rows), dtype=np.float32)
+        self._matrix = sparse.csr_matrix(
+            (data, (rows, cols)), shape=(len(self._names), len(self._columns))
+        )
+        self._sizes_array = np.asarray(self._sizes, dtype=np.float64)
+
+    def candidates(self, text: str, min_overlap: float = 0.4,
+                   limit: int = 10) -> List[Tuple[str, Any, float]]:
+        """Même contrat que NgramIndex.candidates, calculé en un produit matriciel"""
+        if not self._names:
+            return []
+        if self._matrix is None:
+            self._compile()
+
+        columns = [self._columns[gram] for gram in char_ngrams(text, self.n) if gram in self._columns]
+        if not columns:
+            return []
+
+        title_vector = np.zeros(len(self._columns), dtype=np.float32)
+        title_vector[columns] = 1.0
+        # Comptes entiers exacts, divisés en float64 comme dans la version Python
+        overlaps = (self._matrix @ title_vector) / self._sizes_array
+
+        selected = np.flatnonzero(overlaps >= min_overlap)
+        if selected.size > limit:
+            # Sélection top-k sans tri complet (ex aequo du k-ième conservés)
+            kth = np.partition(-overlaps[selected], limit - 1)[limit - 1]
+            selected = selected[-overlaps[selected] <= kth]
+        # Meilleurs recouvrements d'abord, puis ordre d'insertion
+        selected = selected[np.lexsort((selected, -overlaps[selected]))][:limit]
+
+        return [
+            (self._names[i], self._values[i], float(overlaps[i]))
+            for i in selected
+        ]
+
+
+def check_vector_path() -> int:
+    """
+    Extraction identique avec les index vectorisés (seuil abaissé à 0) et
+    les listes de trigrammes en Python, sur les titres du jeu de données
+    """
+    import json
+    from pathlib import Path
+
+    from hybrid_extractor import HybridMotorcycleExtractor
+    # Classe telle qu'importée par l'extracteur (ce fichier tourne sous __main__)
+    from vector_index import VectorNgramIndex as IndexClass
+
+    data_dir = Path(__file__).parent / "data"
+    titles = [
+        json.loads(line)["input"].split('\n')[0].removeprefix("Title: ")
+        for path in sorted(data_dir.glob("*.jsonl"))
+        for line in open(path, 'r', encoding='utf-8')
+    ]
+    titles += ["Ducatti Monstre 821", "Kawaski Versys", "Triumh Stret Triple", "Italian superbike acceleration"]
+
+    # Extracteur par défaut construit en dernier : la base compilée reste la sienne
+    vectorized = HybridMotorcycleExtractor(verbose=False, cache_size=0, classifier_path=None,
+                                           vector_min_entries=0)
+    reference = HybridMotorcycleExtractor(verbose=False, cache_size=0, classifier_path=None)
+    for name in ("_manufacturer_ngrams", "_variant_ngrams"):
+        if not isinstance(getattr(vectorized, name), IndexClass):
+            print(f"❌ {name} n'est pas vectorisé")
+            return 1
+
+    mismatches = 0
+    for title in titles:
+        expected = (reference.extract(title, use_ai_fallback=False), reference.extract_top_k(title))
+        actual = (vectorized.extract(title, use_ai_fallback=False), vectorized.extract_top_k(title))
+        if actual != expected:
+            mismatches += 1
+            print(f"❌ {title!r}: {actual[0]} au lieu de {expected[0]}")
+
+    print(f"{'✅' if not mismatches else '❌'} Index vectorisés : {len(titles) - mismatches}/{len(titles)} "
+          f"extractions identiques")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(check_vector_path())